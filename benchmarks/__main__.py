@@ -0,0 +1,187 @@
+"""Time the stages of doq on synthetic corpora.
+
+    $ python -m benchmarks --save baseline.json
+    $ python -m benchmarks --compare baseline.json --threshold 10
+
+The second run fails if any stage got more than 10% slower.
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.corpus import (
+    CORPORA,
+    generate,
+)
+from doq.cli import (
+    generate_docstrings,
+    get_template_name,
+    get_template_path,
+)
+from doq.outputter import (
+    JSONOutputter,
+    StringOutptter,
+)
+from doq.parser import (
+    parse,
+    parse_ordered,
+)
+from doq.template import get_template
+
+
+def measure(func, repeat):
+    """Return the fastest of repeated calls, in seconds.
+
+    The minimum is the least disturbed by other processes.
+
+    :param func: Function without arguments
+    :param repeat: Number of calls
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def render(template, signatures):
+    for signature, _ in signatures:
+        template.load(signature, get_template_name(signature, True, True))
+
+
+def get_stages(code, path):
+    """Return benchmarked stages of doq for code.
+
+    :param code: Source code
+    :param path: Template directory
+    """
+    lines = code.split('\n')
+    template = get_template(path)
+    signatures = parse_ordered(code, parser='ast')
+    docstrings = generate_docstrings(lines, path)
+
+    return {
+        'parse[parso]': lambda: parse(code, parser='parso'),
+        'parse[ast]': lambda: parse(code, parser='ast'),
+        'generate_docstrings': lambda: generate_docstrings(lines, path),
+        'Template.load': lambda: render(template, signatures),
+        'StringOutptter.format': lambda: StringOutptter().format(lines, docstrings, indent=4),
+        'JSONOutputter.format': lambda: JSONOutputter().format(lines, docstrings, indent=4),
+    }
+
+
+def run(corpora, formatter, repeat):
+    path = get_template_path(template_path=None, formatter=formatter)
+    results = {}
+    for name in corpora:
+        stages = get_stages(generate(name), path)
+        for stage, func in stages.items():
+            results['{0}:{1}'.format(name, stage)] = measure(func, repeat)
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return report lines and names of benchmarks slower than threshold.
+
+    :param results: Timings of this run
+    :param baseline: Saved timings
+    :param threshold: Allowed slowdown in percent
+    """
+    lines = []
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            lines.append('{0:<45} {1:>10.2f}ms {2:>10} {3:>8}'.format(name, seconds * 1000, '-', 'new'))
+            continue
+
+        change = (seconds / baseline[name] - 1) * 100
+        lines.append('{0:<45} {1:>10.2f}ms {2:>10.2f}ms {3:>+7.1f}%'.format(
+            name,
+            seconds * 1000,
+            baseline[name] * 1000,
+            change,
+        ))
+        if change > threshold:
+            regressions.append(name)
+
+    return lines, regressions
+
+
+def parse_options(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark doq on synthetic corpora.',
+    )
+    parser.add_argument(
+        '--corpus',
+        default=','.join(CORPORA),
+        help='Comma separated corpora. Default is all of {0}'.format(','.join(CORPORA)),
+    )
+    parser.add_argument(
+        '--formatter',
+        default='sphinx',
+        help='Docstring formatter. sphinx,google or numpy',
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=5,
+        help='Number of runs of each stage. The fastest one counts',
+    )
+    parser.add_argument(
+        '--save',
+        default=None,
+        help='Save timings to JSON file as baseline',
+    )
+    parser.add_argument(
+        '--compare',
+        default=None,
+        help='Compare timings with baseline saved by --save',
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=10.0,
+        help='Fail --compare if a stage is slower than baseline by more than this percentage',
+    )
+    args = parser.parse_args(argv)
+    unknown = set(args.corpus.split(',')) - set(CORPORA)
+    if unknown:
+        parser.error('unknown corpus: {0}'.format(','.join(sorted(unknown))))
+
+    return args
+
+
+def main(argv=None):
+    args = parse_options(argv)
+    results = run(args.corpus.split(','), args.formatter, args.repeat)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.threshold)
+    else:
+        lines = ['{0:<45} {1:>10.2f}ms'.format(n, s * 1000) for n, s in results.items()]
+
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if regressions:
+        sys.stderr.write('{0} benchmark(s) slower than {1}% over baseline: {2}\n'.format(
+            len(regressions),
+            args.threshold,
+            ', '.join(regressions),
+        ))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
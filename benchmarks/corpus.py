@@ -0,0 +1,149 @@
+"""Synthetic modules which stress different parts of doq."""
+import random
+
+TYPES = (
+    'int',
+    'str',
+    'Optional[int]',
+    'List[str]',
+    'Dict[str, Any]',
+    'Tuple[int, ...]',
+    'Callable[[int, str], bool]',
+    'Union[int, str, None]',
+)
+
+
+def get_param(rng, i, typed=False, default=False):
+    param = 'arg{0}'.format(i)
+    if typed:
+        param += ': {0}'.format(rng.choice(TYPES))
+    if default:
+        param += ' = {0}'.format(rng.choice(('None', '1', "'foo'", '()')))
+
+    return param
+
+
+def get_def(rng, name, params, indent=0, body=None, return_type=None):
+    space = ' ' * indent
+    signature = '{0}def {1}({2})'.format(space, name, ', '.join(params))
+    if return_type:
+        signature += ' -> {0}'.format(return_type)
+
+    lines = [signature + ':']
+    for line in body or ['return None']:
+        lines.append('{0}    {1}'.format(space, line))
+
+    return lines
+
+
+def functions(rng, count=1000):
+    """Generate a module of many small functions, some raising or yielding.
+
+    :param rng: random.Random
+    :param count: Number of functions
+    """
+    lines = []
+    for i in range(count):
+        params = [get_param(rng, j) for j in range(rng.randint(0, 4))]
+        body = rng.choice((
+            ['return None'],
+            ['if arg0:', "    raise ValueError('arg0')", 'return arg0'],
+            ['for i in range(10):', '    yield i'],
+        )) if params else ['pass']
+        lines += get_def(rng, 'func{0}'.format(i), params, body=body)
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def nested(rng, depth=60, width=5):
+    """Generate classes and functions nested deeply into each other.
+
+    :param rng: random.Random
+    :param depth: Nesting depth
+    :param width: Number of nested chains
+    """
+    lines = []
+    for w in range(width):
+        for d in range(depth):
+            indent = ' ' * (4 * d)
+            if d % 2:
+                lines.append('{0}def inner{1}_{2}(self, arg):'.format(indent, w, d))
+            else:
+                lines.append('{0}class Inner{1}_{2}:'.format(indent, w, d))
+        lines.append('{0}pass'.format(' ' * (4 * depth)))
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def parameters(rng, count=20, params=200):
+    """Generate functions with huge parameter lists spread over lines.
+
+    :param rng: random.Random
+    :param count: Number of functions
+    :param params: Number of parameters of each function
+    """
+    lines = []
+    for i in range(count):
+        lines.append('def func{0}('.format(i))
+        for j in range(params):
+            param = get_param(rng, j, typed=rng.random() < 0.5, default=j >= params * 4 // 5)
+            lines.append('    {0},'.format(param))
+        lines.append('):')
+        lines.append('    pass')
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def decorators(rng, count=200, stack=30):
+    """Generate methods below long decorator stacks.
+
+    :param rng: random.Random
+    :param count: Number of methods
+    :param stack: Number of decorators of each method
+    """
+    lines = ['class Decorated:']
+    for i in range(count):
+        for j in range(stack):
+            lines.append('    @decorator{0}(option={1})'.format(j, i))
+        lines += get_def(rng, 'method{0}'.format(i), ['self', 'arg'], indent=4)
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def typed(rng, count=300):
+    """Generate functions with long annotations and return types.
+
+    :param rng: random.Random
+    :param count: Number of functions
+    """
+    lines = []
+    for i in range(count):
+        count_params = rng.randint(3, 8)
+        params = [get_param(rng, j, typed=True, default=j >= count_params - 2) for j in range(count_params)]
+        return_type = 'Dict[str, List[Tuple[{0}, {1}]]]'.format(rng.choice(TYPES), rng.choice(TYPES))
+        lines += get_def(rng, 'func{0}'.format(i), params, return_type=return_type)
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+CORPORA = {
+    'functions': functions,
+    'nested': nested,
+    'parameters': parameters,
+    'decorators': decorators,
+    'typed': typed,
+}
+
+
+def generate(name, seed=0):
+    """Return code of corpus. The same seed gives the same code.
+
+    :param name: Name of corpus in CORPORA
+    :param seed: Random seed
+    """
+    return CORPORA[name](random.Random(seed))
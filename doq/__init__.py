@@ -1,9 +1,31 @@
-from doq.outputter import ( # noqa F401
-    JSONOutputter,
-    StringOutptter,
-)
-from doq.config import find_config # noqa F401
-from doq.parser import parse   # noqa F401
-from doq.template import Template  # noqa F401
+import importlib
 
 __version__ = '0.10.0'
+
+# Submodules pull in parso and jinja2, so they are imported on first access
+# to keep `doq --version` and editor invocations fast.
+_attributes = {
+    'JSONLinesOutputter': 'doq.outputter',
+    'JSONOutputter': 'doq.outputter',
+    'StringOutptter': 'doq.outputter',
+    'docstring_at': 'doq.cli',
+    'find_config': 'doq.config',
+    'generate': 'doq.api',
+    'generate_many': 'doq.api',
+    'parse': 'doq.parser',
+    'Template': 'doq.template',
+}
+
+
+def __getattr__(name):
+    if name not in _attributes:
+        raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
+
+    value = getattr(importlib.import_module(_attributes[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_attributes))
@@ -0,0 +1,92 @@
+"""Generate docstrings in-process, without going through the command line.
+
+Results are DocstringInsertion instances: indented docstrings with the line
+of source they go after, the same as docstring_at returns. Templates are
+compiled on first use and shared by later calls and by every thread. They
+are the only files read, and nothing is written: configuration files are
+not looked up, options are given as arguments, and compiled templates are
+not cached on disk.
+"""
+import threading
+
+from doq.cli import (
+    get_insertion,
+    get_template_path,
+    render_docstrings,
+)
+from doq.parser import parse_ordered
+from doq.source import Source
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(path):
+    """Return compiled templates of directory, shared by every call and thread.
+
+    Unlike doq.template.get_template, no bytecode cache is used.
+
+    :param path: Path to template directory
+    """
+    template = _templates.get(path)
+    if template is None:
+        from doq.template import Template
+
+        with _templates_lock:
+            if path not in _templates:
+                _templates[path] = Template(paths=[path]).compile()
+            template = _templates[path]
+
+    return template
+
+
+def generate(
+    source,
+    formatter='sphinx',
+    template_dir=None,
+    indent=4,
+    omissions=None,
+    ignore_exception=False,
+    ignore_yield=False,
+    ignore_init=False,
+    parser='auto',
+):
+    """Return DocstringInsertion of every def and class of source without docstring.
+
+    :param source: Source code
+    :param formatter: sphinx, google or numpy
+    :param template_dir: Path to template directory, used instead of formatter
+    :param indent: Indent number
+    :param omissions: Names of first argument to omit
+    :param ignore_exception: Ignore exception statements
+    :param ignore_yield: Ignore yield statements
+    :param ignore_init: Ignore __init__ methods
+    :param parser: One of PARSERS
+    """
+    template = get_template(get_template_path(template_dir, formatter))
+    signatures = parse_ordered(
+        source,
+        omissions=omissions,
+        ignore_exception=ignore_exception,
+        ignore_yield=ignore_yield,
+        parser=parser,
+    )
+    is_exception = False if ignore_exception else template.uses('exceptions')
+    is_yield = False if ignore_yield else template.uses('yields')
+    docstrings = render_docstrings(template, signatures, is_exception, is_yield, ignore_init)
+    if not docstrings:
+        return []
+
+    lines = Source(source)
+    return [get_insertion(lines, d, indent) for d in docstrings]
+
+
+def generate_many(sources, formatter='sphinx', template_dir=None, **options):
+    """Return list of DocstringInsertion lists, one for each of sources.
+
+    :param sources: Iterable of source code
+    :param formatter: sphinx, google or numpy
+    :param template_dir: Path to template directory, used instead of formatter
+    :param options: Options of generate
+    """
+    return [generate(source, formatter, template_dir, **options) for source in sources]
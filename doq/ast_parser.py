@@ -0,0 +1,504 @@
+"""Signature extraction on top of the stdlib ast module.
+
+CPython's parser is much faster than parso, but its tree does not keep
+whitespace, comments or token positions. Those are recovered from the
+source, so that the signatures are the same as the ones of doq.parser for
+code both can parse.
+"""
+import ast
+import bisect
+import functools
+import re
+import sys
+import tokenize
+import warnings
+
+from doq.models import (
+    ClassSignature,
+    FunctionSignature,
+    Param,
+)
+from doq.source import Source as Lines
+
+# Compile warnings such as invalid escape sequences are reported with the
+# filename as module name.
+FILENAME = '<doq>'
+warnings.filterwarnings('ignore', module=re.escape(FILENAME) + '$')
+
+# Errors of code the ast module can not handle
+ERRORS = (SyntaxError, ValueError, RecursionError, tokenize.TokenError)
+
+# Nodes whose bodies are searched for defs, classes and raise statements;
+# the counterparts of parso's node types. parso does not know match
+# statements but recovers their cases as blocks.
+CONTAINERS = tuple(
+    getattr(ast, name)
+    for name in (
+        'If', 'While', 'For', 'AsyncFor', 'Try', 'TryStar', 'With', 'AsyncWith',
+        'ExceptHandler', 'Match', 'match_case',
+    )
+    if hasattr(ast, name)
+)
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+SKIPPED_TOKENS = frozenset([tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT])
+OPENING = frozenset(['(', '[', '{'])
+CLOSING = frozenset([')', ']', '}'])
+STRING_START = re.compile(r'[a-zA-Z]*(\'\'\'|"""|\'|")')
+
+
+class Source:
+    """Lines of source code with helpers to map ast positions.
+
+    Positions are ``(lineno, col)`` pairs where ``col`` counts characters,
+    as in parso. ast counts UTF-8 bytes instead.
+
+    :param code: Source code
+    """
+
+    def __init__(self, code):
+        self.lines = Lines(code)
+
+    def get_col(self, lineno, offset):
+        line = self.lines[lineno - 1]
+        if line.isascii():
+            return offset
+
+        return len(line.encode('utf-8')[:offset].decode('utf-8'))
+
+    def get_start(self, node):
+        return node.lineno, self.get_col(node.lineno, node.col_offset)
+
+    def get_end(self, node):
+        return node.end_lineno, self.get_col(node.end_lineno, node.end_col_offset)
+
+    def get_text(self, start, end):
+        (start_lineno, start_col), (end_lineno, end_col) = start, end
+        if start_lineno == end_lineno:
+            return self.lines[start_lineno - 1][start_col:end_col]
+
+        offsets = self.lines.offsets
+        return self.lines.text[offsets[start_lineno - 1] + start_col:offsets[end_lineno - 1] + end_col]
+
+    def iter_lines(self, lineno, col):
+        yield self.lines[lineno - 1][col:] + '\n'
+        for i in range(lineno, len(self.lines)):
+            yield self.lines[i] + '\n'
+
+    def iter_tokens(self, start):
+        """Tokenize source from position on, skipping comments and indents.
+
+        Tokens are ``(type, string, start, end)`` with positions in source.
+
+        :param start: Position to start from
+        """
+        lineno, col = start
+        readline = functools.partial(next, self.iter_lines(lineno, col), '')
+        for token in tokenize.generate_tokens(readline):
+            if token.type in SKIPPED_TOKENS:
+                continue
+
+            (srow, scol), (erow, ecol) = token.start, token.end
+            yield (
+                token.type,
+                token.string,
+                (lineno + srow - 1, scol + col if srow == 1 else scol),
+                (lineno + erow - 1, ecol + col if erow == 1 else ecol),
+            )
+
+    def get_first_leaf(self, start):
+        """Return first token after keyword at position, as parso's first leaf.
+
+        parso splits f-strings, so only their opening is returned.
+
+        :param start: Position of keyword
+        """
+        tokens = self.iter_tokens(start)
+        next(tokens)
+        type_, string, start, end = next(tokens)
+        if type_ == tokenize.STRING and 'f' in STRING_START.match(string).group().lower():
+            string = STRING_START.match(string).group()
+            end = (start[0], start[1] + len(string))
+
+        return string, end
+
+
+def split_params(tokens):
+    """Split tokens of a parameter list at commas.
+
+    Returns a list of parameters, each a list of ``(token, depth)``.
+
+    :param tokens: Tokens following the opening parenthesis
+    """
+    params = [[]]
+    depth = 0
+    for token in tokens:
+        string = token[1]
+        if string in CLOSING:
+            if depth == 0:
+                break
+            depth -= 1
+        elif string == ',' and depth == 0:
+            params.append([])
+            continue
+
+        params[-1].append((token, depth))
+        if string in OPENING:
+            depth += 1
+
+    return [p for p in params if p]
+
+
+def parse_param(source, tokens):
+    """Return name, annotation and default of a parameter.
+
+    Returns None for the ``*`` and ``/`` separators.
+
+    :param tokens: Tokens of parameter with depth
+    """
+    while tokens and tokens[0][0][1] in ('*', '**'):
+        tokens = tokens[1:]
+    if not tokens or tokens[0][0][1] == '/':
+        return None
+
+    name = tokens[0][0][1]
+    annotation = None
+    default = None
+    rest = tokens[1:]
+    if rest and rest[0][0][1] == ':':
+        colon = rest[0][0]
+        rest = rest[1:]
+        end = next((i for i, (t, d) in enumerate(rest) if t[1] == '=' and d == 0), len(rest))
+        annotation = source.get_text(colon[3], rest[end - 1][0][3]).strip()
+        rest = rest[end:]
+
+    if rest and rest[0][0][1] == '=':
+        default = source.get_text(rest[0][0][3], rest[-1][0][3]).strip()
+
+    return Param(name, annotation=annotation, default=default)
+
+
+def parse_header(source, node):
+    """Return def keyword, name, parameters and return type of function.
+
+    :param source: Source
+    :param node: ast.FunctionDef or ast.AsyncFunctionDef
+    """
+    tokens = source.iter_tokens(source.get_start(node))
+    keyword = next(tokens)
+    if keyword[1] == 'async':
+        keyword = next(tokens)
+    name = next(tokens)
+
+    depth = 0
+    for token in tokens:
+        if token[1] == '(' and depth == 0:
+            break
+        depth += token[1] in OPENING
+        depth -= token[1] in CLOSING
+
+    params = [parse_param(source, p) for p in split_params(tokens)]
+
+    return_type = None
+    arrow = next(tokens)
+    if arrow[1] == '->':
+        last = arrow
+        depth = 0
+        for token in tokens:
+            if token[1] == ':' and depth == 0:
+                break
+            depth += token[1] in OPENING
+            depth -= token[1] in CLOSING
+            last = token
+        return_type = source.get_text(arrow[3], last[3]).strip()
+
+    return keyword, name[1], [p for p in params if p is not None], return_type
+
+
+def get_end_pos(source, node):
+    """Return end position of def or class the way parso does.
+
+    The block ends with the newline of its last statement, but at end of
+    code without newline it ends with the last statement or its semicolon.
+
+    :param source: Source
+    :param node: Def or class
+    """
+    lineno, col = source.get_end(node)
+    if lineno < len(source.lines):
+        return lineno + 1, 0
+
+    semicolon = re.match(r'[ \t\f]*;', source.lines[lineno - 1][col:])
+    if semicolon:
+        col += semicolon.end()
+
+    return lineno, col
+
+
+def is_doc_exists(source, node):
+    first = node.body[0]
+    if not isinstance(first, ast.Expr) or not isinstance(first.value, ast.Constant):
+        return False
+    if not isinstance(first.value.value, (str, bytes)):
+        return False
+
+    # Neither concatenated nor parenthesized strings, nor f-strings, count.
+    tokens = source.iter_tokens(source.get_start(first))
+    type_, string, _, _ = next(tokens)
+    if type_ != tokenize.STRING or 'f' in STRING_START.match(string).group().lower():
+        return False
+
+    return next(tokens)[1] in ('', '\n', ';')
+
+
+def get_decorator_name(node):
+    """Return the dotted name decorator starts with, such as ``functools.wraps``.
+
+    :param node: Expression of decorator
+    """
+    attributes = []
+    while not isinstance(node, ast.Name):
+        if isinstance(node, ast.Attribute):
+            attributes.append(node.attr)
+            node = node.value
+        elif isinstance(node, ast.Call):
+            # Names after a call or subscript are not part of it.
+            attributes = []
+            node = node.func
+        elif isinstance(node, ast.Subscript):
+            attributes = []
+            node = node.value
+        else:
+            return ''
+
+    return '.'.join([node.id] + attributes[::-1])
+
+
+def parse_funcdef(source, node, omissions):
+    keyword, name, params, return_type = parse_header(source, node)
+    # Docstrings are indented relative to the async keyword, where the
+    # node starts.
+    start_lineno = keyword[2][0]
+    start_col = source.get_start(node)[1]
+    (end_lineno, end_col) = get_end_pos(source, node)
+
+    decorators = [get_decorator_name(d) for d in node.decorator_list]
+    is_classmethod = 'classmethod' in decorators
+    skip_first = is_classmethod
+    if params and not skip_first and params[0].argument in omissions:
+        skip_first = True
+
+    return FunctionSignature(
+        name=name,
+        params=params[1:] if skip_first else params,
+        return_type=return_type,
+        start_lineno=start_lineno,
+        start_col=start_col,
+        end_lineno=end_lineno,
+        end_col=end_col,
+        is_doc_exists=is_doc_exists(source, node),
+        is_async=isinstance(node, ast.AsyncFunctionDef),
+        is_classmethod=is_classmethod,
+        is_staticmethod='staticmethod' in decorators,
+    )
+
+
+def parse_classdef(source, node):
+    (start_lineno, start_col) = source.get_start(node)
+    (end_lineno, end_col) = get_end_pos(source, node)
+    name = node.name
+    if not name.isascii():
+        # ast normalizes identifiers.
+        tokens = source.iter_tokens((start_lineno, start_col))
+        next(tokens)
+        name = next(tokens)[1]
+
+    return ClassSignature(
+        name=name,
+        start_lineno=start_lineno,
+        start_col=start_col,
+        end_lineno=end_lineno,
+        end_col=end_col,
+        is_doc_exists=is_doc_exists(source, node),
+    )
+
+
+def get_yield(source, node):
+    if isinstance(node, ast.YieldFrom):
+        return 'from'
+    if node.value is None:
+        # Bare yield
+        return ''
+
+    return source.get_first_leaf(source.get_start(node))[0]
+
+
+def get_exception(source, node):
+    if node.exc is None:
+        # Bare raise
+        return ''
+
+    start = source.get_start(node)
+    _, end = source.get_first_leaf(start)
+
+    return source.get_text((start[0], start[1] + len('raise')), end).strip()
+
+
+def iter_yields(node):
+    """Yield yield expressions below node, outside of lambdas and defs.
+
+    Only decorators of defs and classes are searched, as they belong to the
+    enclosing block.
+
+    :param node: ast node
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.Yield, ast.YieldFrom)):
+            yield node
+        elif isinstance(node, ast.Lambda):
+            continue
+        elif isinstance(node, (FUNCTIONS, ast.ClassDef)):
+            stack.extend(node.decorator_list)
+            continue
+
+        stack.extend(ast.iter_child_nodes(node))
+
+
+def get_header_expressions(node):
+    args = node.args
+    for arg in getattr(args, 'posonlyargs', []) + args.args + [args.vararg] + args.kwonlyargs + [args.kwarg]:
+        if arg is not None and arg.annotation is not None:
+            yield arg.annotation
+
+    yield from args.defaults
+    yield from (d for d in args.kw_defaults if d is not None)
+    if node.returns is not None:
+        yield node.returns
+
+
+def visit(tree, source, omissions=None, ignore_exception=False, ignore_yield=False):  # noqa C901
+    """Collect defs and classes of module like doq.parser.visit.
+
+    Only statements are walked. Expressions can not hold defs, classes or
+    raise statements, so they are only searched for yield expressions, and
+    only if their lines mention one.
+
+    :param tree: ast.Module
+    :param source: Source of tree
+    :param omissions: Names of first argument of module level defs to omit
+    :param ignore_exception: Do not collect raise statements
+    :param ignore_yield: Do not collect yield expressions
+    """
+    results = []
+    ordered = []
+    # Raise statements and yield expressions with their position, by def
+    found = {}
+    yield_lines = [] if ignore_yield else [i for i, line in enumerate(source.lines, 1) if 'yield' in line]
+
+    def has_yield(node):
+        if not hasattr(node, 'end_lineno'):
+            # Such as withitem
+            return True
+        i = bisect.bisect_left(yield_lines, node.lineno)
+        return i < len(yield_lines) and yield_lines[i] <= node.end_lineno
+
+    #   (node, def, defs, classes, omissions, find, raisable, yieldable)
+    stack = [
+        (child, None, results, results, omissions or [], True, False, False)
+        for child in reversed(tree.body)
+    ]
+    while stack:
+        (node, func, defs, classes, omit, find, raisable, yieldable) = stack.pop()
+        children = []
+        expressions = []
+        if isinstance(node, (FUNCTIONS, ast.ClassDef)) and find:
+            # Decorators belong to the enclosing block.
+            expressions = node.decorator_list
+            if isinstance(node, FUNCTIONS):
+                signature = parse_funcdef(source, node, omit)
+                defs.append(signature)
+                ordered.append((signature, defs is not results))
+                found[id(signature)] = (signature, [])
+                context = (
+                    signature, defs, defs, [], True, not ignore_exception, not ignore_yield,
+                )
+                children = [(child,) + context for child in node.body]
+                if not ignore_yield:
+                    # Defaults and annotations belong to the def itself.
+                    header = [(child, signature) + context[1:] for child in get_header_expressions(node)]
+                    children = header + children
+            else:
+                signature = parse_classdef(source, node)
+                classes.append(signature)
+                ordered.append((signature, classes is not results))
+                context = (None, signature.defs, classes, ['self'], True, False, False)
+                children = [(child,) + context for child in node.body]
+        elif isinstance(node, CONTAINERS):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.stmt,) + CONTAINERS):
+                    children.append((child, func, defs, classes, omit, find, raisable, yieldable))
+                else:
+                    expressions.append(child)
+        else:
+            if func is not None and raisable and isinstance(node, ast.Raise):
+                found[id(func)][1].append(((node.lineno, node.col_offset), 'exceptions', get_exception(source, node)))
+            expressions = [node]
+
+        if func is not None and yieldable:
+            for expression in expressions:
+                if not has_yield(expression):
+                    continue
+                for y in iter_yields(expression):
+                    found[id(func)][1].append(((y.lineno, y.col_offset), 'yields', get_yield(source, y)))
+
+        stack.extend(reversed(children))
+
+    # Expressions are not walked in source order.
+    for func, items in found.values():
+        for _, key, value in sorted(items, key=lambda i: i[0]):
+            func.add(key, value)
+
+    return results, ordered
+
+
+def parse_source(code):
+    """Return ast tree and Source of code.
+
+    Raises one of ERRORS if the ast module can not be used.
+
+    :param code: Source code
+    """
+    if sys.version_info < (3, 8):
+        raise ValueError('ast has no end positions before Python 3.8')
+    if '\r' in code:
+        # parso and ast do not agree on lines then.
+        raise ValueError('carriage returns are not supported')
+
+    return ast.parse(code, FILENAME), Source(code)
+
+
+def parse(code, omissions=None, ignore_exception=False, ignore_yield=False, ignore_init=False):
+    tree, source = parse_source(code)
+    results, _ = visit(
+        tree,
+        source,
+        omissions=omissions,
+        ignore_exception=ignore_exception,
+        ignore_yield=ignore_yield,
+    )
+
+    return [s.to_dict() for s in results]
+
+
+def parse_ordered(code, omissions=None, ignore_exception=False, ignore_yield=False):
+    tree, source = parse_source(code)
+    _, ordered = visit(
+        tree,
+        source,
+        omissions=omissions,
+        ignore_exception=ignore_exception,
+        ignore_yield=ignore_yield,
+    )
+
+    return ordered
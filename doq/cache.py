@@ -0,0 +1,147 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import time
+
+from doq import __version__
+from doq.source import Source
+
+# Entries not read for this many seconds are removed by ResultCache.prune.
+MAX_AGE = 30 * 24 * 60 * 60
+# Seconds between two prunes of a cache directory.
+PRUNE_INTERVAL = 24 * 60 * 60
+# Files written by ResultCache.set, so that nothing else in a cache
+# directory is ever removed.
+ENTRY = re.compile(r'[0-9a-f]{64}\.json(\.\d+\.tmp)?')
+
+
+def get_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'doq')
+
+
+def hash_templates(path):
+    """Hash every file below template directory.
+
+    :param path: Path to template directory
+    """
+    digest = hashlib.sha256()
+    for root, directories, children in os.walk(path):
+        directories.sort()
+        for child in sorted(children):
+            filepath = os.path.join(root, child)
+            digest.update(os.path.relpath(filepath, path).encode('utf-8'))
+            with open(filepath, 'rb') as f:
+                digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Content addressed cache of ``generate_docstrings`` results.
+
+    Results are kept in memory for the lifetime of the process, so files with
+    identical contents are processed once, and on disk under ``directory``
+    so that subsequent runs can skip unchanged files. Every edit of a file
+    adds an entry, so entries are touched when read and pruned once unused
+    for MAX_AGE.
+    """
+
+    def __init__(self, directory, template_path, options):
+        self.directory = directory
+        self.memory = {}
+        salt = {
+            'version': __version__,
+            'template_path': template_path,
+            'templates': hash_templates(template_path),
+            'options': options,
+        }
+        self.salt = json.dumps(salt, sort_keys=True).encode('utf-8')
+
+    def key(self, lines):
+        digest = hashlib.sha256(self.salt)
+        if isinstance(lines, Source):
+            # Same key as for the list of its lines, without splitting the text.
+            if len(lines):
+                digest.update(lines.text.encode('utf-8', 'surrogateescape'))
+                digest.update(b'\n')
+            return digest.hexdigest()
+
+        for line in lines:
+            digest.update(line.encode('utf-8', 'surrogateescape'))
+            digest.update(b'\n')
+
+        return digest.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key[:2], '{0}.json'.format(key))
+
+    def get(self, key):
+        if key in self.memory:
+            return self.memory[key]
+
+        path = self.get_path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        self.memory[key] = value
+        return value
+
+    def set(self, key, value):
+        self.memory[key] = value
+        path = self.get_path(key)
+        tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+        except OSError:
+            # A read-only or full cache directory must never break a run.
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+
+    def prune(self, max_age=MAX_AGE, interval=PRUNE_INTERVAL):
+        """Remove entries not read for max_age seconds, at most once per interval.
+
+        :param max_age: Seconds since an entry was last read
+        :param interval: Seconds since the last prune of directory
+        """
+        marker = os.path.join(self.directory, 'pruned')
+        now = time.time()
+        with contextlib.suppress(OSError):
+            if now - os.stat(marker).st_mtime < interval:
+                return
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(marker, 'a'):
+                pass
+            os.utime(marker)
+            with os.scandir(self.directory) as entries:
+                # Entries are grouped by the first two characters of their key.
+                groups = [e for e in entries if len(e.name) == 2 and e.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+
+        for group in groups:
+            try:
+                with os.scandir(group.path) as children:
+                    expired = [
+                        c.path for c in children
+                        if c.name.startswith(group.name) and ENTRY.fullmatch(c.name)
+                        and c.stat(follow_symlinks=False).st_mtime < now - max_age
+                    ]
+            except OSError:
+                continue
+
+            for path in expired:
+                with contextlib.suppress(OSError):
+                    os.unlink(path)
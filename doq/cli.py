@@ -1,34 +1,65 @@
 import argparse
+import collections
 import contextlib
+import functools
 import os
 import re
 import sys
 
 from doq import __version__
+from doq.ast_parser import ERRORS as PARSE_ERRORS
 from doq.config import find_config
+from doq.finder import FileFinder
+from doq.interval import IntervalTree
+from doq.models import (
+    DocstringEdit,
+    DocstringInsertion,
+)
 from doq.outputter import (
+    BaseOutputter,
+    JSONLinesOutputter,
     JSONOutputter,
     StringOutptter,
 )
-from doq.parser import parse
-from doq.template import Template
+from doq.parser import (
+    get_index,
+    get_span,
+    parse_ordered,
+    PARSERS,
+    SignatureIndex,
+)
+from doq.prescan import needs_docstrings
+from doq.source import Source
+from doq.stats import (
+    profile,
+    RunStats,
+    STATS_STYLES,
+    timer,
+    Timings,
+)
+from doq.writer import (
+    FileWriter,
+    FSYNC_POLICIES,
+)
+
+# Recycle pool workers after this many files so that memory held by parso
+# trees and jinja environments stays bounded on huge trees.
+MAX_TASKS_PER_CHILD = 500
+# Number of files each worker may have queued or finished but not yet
+# emitted. Keeps memory flat regardless of the size of the tree.
+MAX_IN_FLIGHT_PER_JOB = 4
+# Start line numbers of both sides in a hunk header such as ``@@ -1,4 +1,8 @@``
+HUNK = re.compile(r'([-+])(\d+)')
 
 
-def _sort(key):
-    return key['start_lineno']
+def iter_files(basedir, include=None, exclude=None, gitignore=False, git=False):
+    finder = FileFinder(include=include, exclude=exclude, gitignore=gitignore, git=git)
 
+    return finder.iter_files(basedir)
 
-def find_files(basedir):
-    r = re.compile(r'.*.py$')
-    files = []
-    for root, directories, children in os.walk(os.path.abspath(basedir)):
-        directories[:] = [d for d in directories if not d[0] == '.']
-        if len(children):
-            ret = list(filter(r.match, children))
-            if len(ret):
-                files += [os.path.join(root, r) for r in ret]
 
-    return files
+def find_files(basedir, **kwargs):
+    return list(iter_files(basedir, **kwargs))
 
 
 def get_lines(file, start, end):
@@ -43,6 +74,66 @@ def get_lines(file, start, end):
     return lines
 
 
+def get_text(lines):
+    if isinstance(lines, str):
+        return lines
+    if isinstance(lines, Source):
+        return lines.text
+
+    return '\n'.join(lines)
+
+
+def parse_ranges(value):
+    """Parse line ranges such as ``10-20,140-180``.
+
+    :param value: Comma separated ranges. A single line may be given as ``15``
+    """
+    ranges = []
+    for chunk in value.split(','):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+
+        start, _, end = chunk.partition('-')
+        try:
+            start = int(start)
+            end = int(end) if end else start
+        except ValueError:
+            raise argparse.ArgumentTypeError('invalid range: {0}'.format(chunk))
+
+        if start < 1 or end < start:
+            raise argparse.ArgumentTypeError('invalid range: {0}'.format(chunk))
+
+        ranges.append((start, end))
+
+    return ranges
+
+
+def filter_ranges(signatures, ranges):
+    """Keep defs and classes which intersect any of ranges.
+
+    :param signatures: ``(signature, is_member)`` pairs as returned by parse_ordered
+    :param ranges: List of ``(start, end)`` line ranges
+    """
+    tree = IntervalTree(
+        (*get_span(s), i)
+        for i, (s, _) in enumerate(signatures)
+    )
+    found = set()
+    for start, end in ranges:
+        found.update(tree.overlap(start, end))
+
+    return [s for i, s in enumerate(signatures) if i in found]
+
+
+def get_bounds(args):
+    if getattr(args, 'ranges', None) or getattr(args, 'line', None):
+        # Ranges and lines are resolved against the whole file.
+        return 1, 0
+
+    return args.start, args.end
+
+
 def get_template_path(template_path, formatter):
     if not template_path:
         path = os.path.join(
@@ -55,149 +146,865 @@ def get_template_path(template_path, formatter):
     return os.path.abspath(template_path)
 
 
-def generate_def_docstrings(signature, template, is_exception=False, is_yield=False, ignore_init=False):
+def get_template_name(signature, is_exception=False, is_yield=False):
+    if 'defs' in signature:
+        return 'class.txt'
+
+    if len(signature['params']) \
+            or signature['return_type'] \
+            or is_exception and signature['exceptions'] \
+            or is_yield and signature['yields']:
+        return 'def.txt'
+
+    return 'noarg.txt'
+
+
+def generate_docstrings(
+    code,
+    path,
+    omissions=None,
+    ignore_exception=False,
+    ignore_yield=False,
+    ignore_init=False,
+    parser='auto',
+    timings=None,
+    ranges=None,
+):
+    with timer(timings, 'render'):
+        from doq.template import get_template
+
+        template = get_template(path)
+    with timer(timings, 'parse'):
+        signatures = parse_ordered(
+            get_text(code),
+            omissions=omissions,
+            ignore_exception=ignore_exception,
+            ignore_yield=ignore_yield,
+            parser=parser,
+        )
+        if ranges:
+            signatures = filter_ranges(signatures, ranges)
+    is_exception = False if ignore_exception else template.uses('exceptions')
+    is_yield = False if ignore_yield else template.uses('yields')
+
+    with timer(timings, 'render'):
+        return render_docstrings(template, signatures, is_exception, is_yield, ignore_init)
+
+
+def is_docstring_required(signature, is_member, ignore_init=False):
+    if is_member and ignore_init and signature.name == '__init__':
+        # numpy style guide says constructor's docstring should
+        # documented at class docstring.
+        # https://numpydoc.readthedocs.io/en/latest/format.html#class-docstring
+        return False
+
+    return True
+
+
+def is_missing_docstring(signature, is_member, ignore_init=False):
+    return not signature.is_doc_exists and is_docstring_required(signature, is_member, ignore_init)
+
+
+def render_docstrings(template, signatures, is_exception, is_yield, ignore_init):
     docstrings = []
-    for d in signature['defs']:
-        if d['is_doc_exists'] is False:
-            filename = 'noarg.txt'
-            if ('params' in d and len(d['params'])) \
-                    or ('return_type' in d and d['return_type']) \
-                    or (is_exception and 'exceptions' in d and len(d['exceptions']) > 0) \
-                    or (is_yield and 'yields' in d and len(d['yields']) > 0):
-                filename = 'def.txt'
-            elif 'defs' in d:
-                filename = 'class.txt'
-
-            if ignore_init and d['name'] == '__init__':
-                # numpy style guide says constructor's docstring should
-                # documented at class docstring.
-                # https://numpydoc.readthedocs.io/en/latest/format.html#class-docstring
-                pass
-            else:
-                docstring = template.load(params=d, filename=filename)
-                docstrings.append(
-                    {
-                        'docstring': docstring,
-                        'start_lineno': d['start_lineno'],
-                        'start_col': d['start_col'],
-                        'end_lineno': d['end_lineno'],
-                        'end_col': d['start_col'],
-                    },
-                )
-            if 'defs' in d:
-                results = generate_def_docstrings(d, template, is_exception, is_yield, ignore_init=ignore_init)
-                if len(results):
-                    docstrings += results
+    for signature, is_member in signatures:
+        if not is_missing_docstring(signature, is_member, ignore_init):
+            continue
+
+        filename = get_template_name(signature, is_exception, is_yield)
+        end_col = signature.start_col
+        if filename == 'class.txt' and not is_member:
+            end_col = signature.end_col
+
+        docstring = template.load(params=signature, filename=filename)
+        docstrings.append(
+            DocstringEdit(
+                docstring=docstring,
+                start_lineno=signature.start_lineno,
+                start_col=signature.start_col,
+                end_lineno=signature.end_lineno,
+                end_col=end_col,
+            ),
+        )
 
     return docstrings
 
 
-def is_exception_enabled(path):
-    with open(path) as f:
-        return 'exceptions' in f.read()
+def render_docstring_at(index, line, path, ignore_exception=False, ignore_yield=False, ignore_init=False):
+    """Return DocstringEdit of innermost def or class spanning line without docstring, or None.
+
+    :param index: SignatureIndex of source
+    :param line: Lineno
+    :param path: Path to template directory
+    :param ignore_exception: Ignore exception statements
+    :param ignore_yield: Ignore yield statements
+    :param ignore_init: Ignore __init__ methods
+    """
+    for found in index.spanning(line):
+        if is_missing_docstring(*found, ignore_init=ignore_init):
+            break
+    else:
+        return None
 
+    from doq.template import get_template
 
-def is_yield_enabled(path):
-    with open(path) as f:
-        return 'yields' in f.read()
+    template = get_template(path)
+    is_exception = False if ignore_exception else template.uses('exceptions')
+    is_yield = False if ignore_yield else template.uses('yields')
 
+    return render_docstrings(template, [found], is_exception, is_yield, ignore_init)[0]
 
-def generate_docstrings(
+
+def docstring_at(
     code,
+    line,
     path,
+    indent=4,
     omissions=None,
     ignore_exception=False,
     ignore_yield=False,
     ignore_init=False,
+    parser='auto',
 ):
-    template = Template(paths=[path])
-    signatures = parse(
-        '\n'.join(code),
+    """Return docstring of innermost def or class spanning line without docstring, or None.
+
+    Editors can call this on every cursor move. Signatures of the last
+    buffers are kept indexed by the lines they span, so asking again about
+    the same buffer does not parse it again.
+
+    :param code: Source code
+    :param line: Lineno
+    :param path: Path to template directory
+    :param indent: Indent number
+    :param omissions: Names of first argument to omit
+    :param ignore_exception: Ignore exception statements
+    :param ignore_yield: Ignore yield statements
+    :param ignore_init: Ignore __init__ methods
+    :param parser: One of PARSERS
+    """
+    index = get_index(code, tuple(omissions or ()), ignore_exception, ignore_yield, parser)
+    docstring = render_docstring_at(index, line, path, ignore_exception, ignore_yield, ignore_init)
+    if docstring is None:
+        return None
+
+    return get_insertion(index.lines, docstring, indent)
+
+
+def get_insertion(lines, docstring, indent=4):
+    """Return DocstringInsertion of DocstringEdit, indented and placed in lines.
+
+    :param lines: Source or list of lines
+    :param docstring: DocstringEdit
+    :param indent: Indent number
+    """
+    outputter = BaseOutputter()
+    column = docstring.start_col + indent
+
+    return DocstringInsertion(
+        docstring=outputter.indent_docstring(docstring.docstring, column),
+        line=outputter.detect_insert_point(lines, docstring.start_lineno, docstring.end_lineno),
+        column=column,
+        start_lineno=docstring.start_lineno,
+        end_lineno=docstring.end_lineno,
+    )
+
+
+def load_target(target, start=1, end=0):
+    if 'lines' not in target:
+        with open(target['path']) as f:
+            target['lines'] = Source.read(f, start, end)
+
+    return target
+
+
+def iter_targets(args):
+    if args.recursive:
+        # Only paths are yielded; the contents are read by whoever processes
+        # the target so that at most one file per worker is held in memory.
+        files = iter_files(
+            args.directory,
+            include=getattr(args, 'include', None),
+            exclude=getattr(args, 'exclude', None),
+            gitignore=getattr(args, 'gitignore', False),
+            git=getattr(args, 'git', False),
+        )
+        for file in files:
+            yield {'path': file}
+
+        return
+
+    lines = Source.read(args.file, *get_bounds(args))
+    if len(lines) == 0:
+        return
+
+    path = args.file.name \
+        if args.file.name == '<stdin>' \
+        else os.path.abspath(args.file.name)
+
+    yield {
+        'path': path,
+        'lines': lines,
+    }
+
+
+def get_targets(args):
+    targets = []
+    for target in iter_targets(args):
+        target = load_target(target, *get_bounds(args))
+        if len(target['lines']) == 0:
+            continue
+        targets.append(target)
+
+    if not args.recursive and len(targets) == 0:
+        return False
+
+    return targets
+
+
+def report_parse_error(target, error):
+    """Tell on stderr that target is skipped since it does not compile.
+
+    :param target: Target
+    :param error: One of PARSE_ERRORS
+    """
+    path = get_display_path(target['path'])
+    lineno = getattr(error, 'lineno', None)
+    if lineno:
+        path = '{0}:{1}'.format(path, lineno)
+    sys.stderr.write('{0}: skipped, {1}\n'.format(path, getattr(error, 'msg', None) or error))
+
+
+def get_docstrings(target, path, omissions=None, ignore_exception=False, ignore_yield=False, ignore_init=False,
+                   cache=None, parser='auto', timings=None, line=None, ranges=None):
+    """Return DocstringEdits, or dicts of them from cache, of a loaded target.
+
+    :param target: Target with lines
+    :param path: Path to template directory
+    :param omissions: Names of first argument to omit
+    :param ignore_exception: Ignore exception statements
+    :param ignore_yield: Ignore yield statements
+    :param ignore_init: Ignore __init__ methods
+    :param cache: ResultCache or None
+    :param parser: One of PARSERS
+    :param timings: Timings or None
+    :param line: Only generate docstring of the innermost def or class spanning lineno
+    :param ranges: Only generate docstrings of defs and classes intersecting these line ranges
+    """
+    with timer(timings, 'scan'):
+        if not needs_docstrings(get_text(target['lines'])):
+            return []
+
+    if line is not None:
+        with timer(timings, 'parse'):
+            index = get_index(get_text(target['lines']), tuple(omissions or ()), ignore_exception, ignore_yield, parser)
+        with timer(timings, 'render'):
+            docstring = render_docstring_at(index, line, path, ignore_exception, ignore_yield, ignore_init)
+
+        return [] if docstring is None else [docstring]
+
+    # Entries are of whole files.
+    cache = None if ranges else cache
+    if cache is not None:
+        with timer(timings, 'cache'):
+            key = cache.key(target['lines'])
+            docstrings = cache.get(key)
+        if docstrings is not None:
+            return docstrings
+
+    docstrings = generate_docstrings(
+        code=target['lines'],
+        path=path,
         omissions=omissions,
         ignore_exception=ignore_exception,
         ignore_yield=ignore_yield,
         ignore_init=ignore_init,
+        parser=parser,
+        timings=timings,
+        ranges=ranges,
     )
-    is_exception = False if ignore_exception else is_exception_enabled(os.path.join(path, 'def.txt'))
-    is_yield = False if ignore_yield else is_yield_enabled(os.path.join(path, 'def.txt'))
-
-    docstrings = []
-    for signature in signatures:
-        if 'defs' in signature:
-            # Class docstring
-            if signature['is_doc_exists'] is False:
-                docstring = template.load(params=signature, filename='class.txt')
-                docstrings.append(
-                    {
-                        'docstring': docstring,
-                        'start_lineno': signature['start_lineno'],
-                        'start_col': signature['start_col'],
-                        'end_lineno': signature['end_lineno'],
-                        'end_col': signature['end_col'],
-                    },
-                )
-
-            # Method docstring
-            docstrings += generate_def_docstrings(signature, template, is_exception, is_yield, ignore_init)
-        else:
-            if signature['is_doc_exists'] is False:
-                filename = 'noarg.txt'
-                if len(signature['params']) \
-                        or signature['return_type'] \
-                        or is_exception and signature['exceptions'] \
-                        or is_yield and signature['yields']:
-                    filename = 'def.txt'
-
-                # Function docstring
-                docstring = template.load(params=signature, filename=filename)
-                docstrings.append(
-                    {
-                        'docstring': docstring,
-                        'start_lineno': signature['start_lineno'],
-                        'start_col': signature['start_col'],
-                        'end_lineno': signature['end_lineno'],
-                        'end_col': signature['start_col'],
-                    },
-                )
-
-    docstrings.sort(key=_sort)
+    if cache is not None:
+        with timer(timings, 'cache'):
+            # Cached on disk as JSON.
+            cache.set(key, [d.to_dict() for d in docstrings])
 
     return docstrings
 
 
-def get_targets(args):
-    targets = []
-    if args.recursive:
-        files = find_files(args.directory)
-        for file in files:
-            with open(file) as f:
-                lines = get_lines(f, args.start, args.end)
-                if len(lines) == 0:
-                    continue
-                targets.append({
-                    'path': file,
-                    'lines': lines,
-                })
-    else:
-        lines = get_lines(args.file, args.start, args.end)
-        if len(lines) == 0:
-            return False
+def get_outputter(style, path):
+    if style == 'json':
+        return JSONOutputter()
+    if style == 'jsonl':
+        return JSONLinesOutputter(path=path)
 
-        args.file.name == '<stdin>'
-        path = args.file.name \
-            if args.file.name == '<stdin>' \
-            else os.path.abspath(args.file.name)
+    return StringOutptter()
 
-        targets.append({
-            'path': path,
-            'lines': lines,
-        })
 
-    return targets
+def format_target(target, path, style='string', indent=4, omissions=None,
+                  ignore_exception=False, ignore_yield=False, ignore_init=False,
+                  start=1, end=0, cache=None, ranges=None, parser='auto', timings=None, line=None):
+    with timer(timings, 'read'):
+        target = load_target(target, start, end)
+    if len(target['lines']) == 0:
+        return None
+
+    # Docstrings of targets are given when they were generated elsewhere,
+    # such as by SharedDocstrings.
+    docstrings = target.get('docstrings')
+    if docstrings is None:
+        try:
+            docstrings = get_docstrings(
+                target,
+                path,
+                omissions=omissions,
+                ignore_exception=ignore_exception,
+                ignore_yield=ignore_yield,
+                ignore_init=ignore_init,
+                cache=cache,
+                parser=parser,
+                timings=timings,
+                line=line,
+                ranges=ranges,
+            )
+        except PARSE_ERRORS as e:
+            report_parse_error(target, e)
+            return None
+
+    if timings is not None:
+        timings.docstrings = len(docstrings)
+    if len(docstrings) == 0:
+        return None
+
+    outputter = get_outputter(style, target['path'])
+    with timer(timings, 'format'):
+        return outputter.format(
+            lines=target['lines'],
+            docstrings=docstrings,
+            indent=indent,
+        )
+
+
+def get_display_path(path):
+    """Return path relative to the current directory if it is below it.
+
+    :param path: Absolute path or <stdin>
+    """
+    try:
+        relpath = os.path.relpath(path)
+    except ValueError:
+        # Such as another drive on Windows
+        return path
+
+    return path if relpath.startswith(os.pardir) else relpath
+
+
+def parse_target(target, start=1, end=0, omissions=None, parser='auto', timings=None, prescan=False):
+    """Return signatures of target without exceptions and yields, or None if it is empty.
+
+    :param target: Target
+    :param start: Start lineno
+    :param end: End lineno
+    :param omissions: Names of first argument to omit
+    :param parser: One of PARSERS
+    :param timings: Timings or None
+    :param prescan: Return no signatures without parsing if every def and class has a docstring
+    """
+    with timer(timings, 'read'):
+        target = load_target(target, start, end)
+    if len(target['lines']) == 0:
+        return None
+    if prescan:
+        with timer(timings, 'scan'):
+            if not needs_docstrings(get_text(target['lines'])):
+                return []
+
+    try:
+        with timer(timings, 'parse'):
+            return parse_ordered(
+                get_text(target['lines']),
+                omissions=omissions,
+                ignore_exception=True,
+                ignore_yield=True,
+                parser=parser,
+            )
+    except PARSE_ERRORS as e:
+        report_parse_error(target, e)
+        return None
+
+
+def count_target(target, ignore_init=False, start=1, end=0, parser='auto', timings=None):
+    """Return numbers of documented and of all defs and classes of target, or None.
+
+    :param target: Target
+    :param ignore_init: Do not count ``__init__`` methods
+    :param start: Start lineno
+    :param end: End lineno
+    :param parser: One of PARSERS
+    :param timings: Timings or None
+    """
+    signatures = parse_target(target, start, end, parser=parser, timings=timings)
+    if signatures is None:
+        return None
+
+    documented = 0
+    total = 0
+    for signature, is_member in signatures:
+        if is_docstring_required(signature, is_member, ignore_init):
+            total += 1
+            documented += signature.is_doc_exists
+
+    return documented, total
+
+
+def check_target(target, omissions=None, ignore_init=False, start=1, end=0, parser='auto', timings=None,
+                 ranges=None, line=None):
+    """List defs and classes of target without docstring, or return None.
+
+    :param target: Target
+    :param omissions: Names of first argument to omit
+    :param ignore_init: Do not require docstrings of ``__init__`` methods
+    :param start: Start lineno
+    :param end: End lineno
+    :param parser: One of PARSERS
+    :param timings: Timings or None
+    :param ranges: Only list defs and classes intersecting these line ranges
+    :param line: Only list the innermost def or class spanning lineno without docstring
+    """
+    signatures = parse_target(
+        target,
+        start,
+        end,
+        omissions=omissions,
+        parser=parser,
+        timings=timings,
+        prescan=True,
+    )
+    if signatures is None:
+        return None
+
+    if ranges:
+        signatures = filter_ranges(signatures, ranges)
+    missing = [s for s, is_member in signatures if is_missing_docstring(s, is_member, ignore_init)]
+    if line is not None:
+        index = SignatureIndex(get_text(target['lines']), signatures)
+        spanning = [s for s, is_member in index.spanning(line) if is_missing_docstring(s, is_member, ignore_init)]
+        missing = spanning[:1]
+
+    if timings is not None:
+        timings.docstrings = len(missing)
+
+    return '\n'.join(
+        '{0}:{1}:{2}: missing docstring in {3}'.format(
+            get_display_path(target['path']),
+            signature.start_lineno + start - 1,
+            signature.start_col + 1,
+            signature.name,
+        )
+        for signature in missing
+    ) or None
+
+
+def diff_target(target, worker, start=1, **kwargs):
+    """Return unified diff of target and its output, or None.
+
+    :param target: Target
+    :param worker: format_target with options
+    :param start: Start lineno, which hunks of the diff are shifted to
+    """
+    output = worker(target, **kwargs)
+    if output is None:
+        return None
+
+    import difflib
+
+    path = get_display_path(target['path'])
+    diff = difflib.unified_diff(
+        list(target['lines']),
+        output.split('\n'),
+        fromfile=path,
+        tofile=path,
+        lineterm='',
+    )
+    if start > 1:
+        diff = (shift_hunk(d, start - 1) for d in diff)
+
+    return '\n'.join(diff) or None
+
+
+def shift_hunk(line, offset):
+    """Add offset to line numbers of a hunk header of unified diff.
+
+    :param line: Line of diff
+    :param offset: Number of lines before the diffed part of file
+    """
+    if not line.startswith('@@ '):
+        return line
+
+    return HUNK.sub(lambda m: '{0}{1}'.format(m.group(1), int(m.group(2)) + offset), line)
+
+
+def format_target_with_timings(target, worker):
+    # Targets read by SharedDocstrings come with the timings of reading.
+    timings = target.pop('timings', None) or Timings()
+
+    return worker(target, timings=timings), timings
+
+
+def generate_target(target, generator, timed=False):
+    """Return docstrings of a loaded target as dicts, and Timings or None.
+
+    Docstrings are None if target does not compile, for the main process
+    to report.
+
+    :param target: Target with lines
+    :param generator: get_docstrings with options
+    :param timed: Time generating
+    """
+    timings = Timings() if timed else None
+    try:
+        docstrings = generator(target, timings=timings)
+    except PARSE_ERRORS:
+        return None, timings
+
+    return [d.to_dict() for d in docstrings], timings
+
+
+class SharedDocstrings:
+    """Generate docstrings of each distinct content once with several jobs.
+
+    Every pool task gets its own copy of a ResultCache, so identical files
+    handled by different tasks would all be processed. Instead, targets are
+    read and looked up in the cache in the main process, and only content
+    which is neither cached nor pending is sent to the pool. Outputs are
+    then formatted in the main process from the docstrings given to targets.
+
+    :param cache: ResultCache
+    :param generator: get_docstrings with options, without cache
+    :param start: Start lineno
+    :param end: End lineno
+    :param timed: Time reading and generating
+    """
+
+    def __init__(self, cache, generator, start=1, end=0, timed=False):
+        self.cache = cache
+        self.generator = generator
+        self.start = start
+        self.end = end
+        self.timed = timed
+        self.pending = {}
+
+    def submit(self, pool, target):
+        """Read target and start generating docstrings of its content unless known.
+
+        :param pool: multiprocessing.Pool
+        :param target: Target
+        """
+        timings = Timings() if self.timed else None
+        with timer(timings, 'read'):
+            target = load_target(target, self.start, self.end)
+        if timings is not None:
+            target['timings'] = timings
+        if len(target['lines']) == 0:
+            return target
+
+        with timer(timings, 'cache'):
+            key = self.cache.key(target['lines'])
+            if key not in self.pending and self.cache.get(key) is None:
+                self.pending[key] = pool.apply_async(generate_target, (target, self.generator, self.timed))
+        target['key'] = key
+
+        return target
+
+    def resolve(self, target):
+        """Give target the docstrings of its content, waiting for them if needed.
+
+        :param target: Target returned by submit
+        """
+        key = target.pop('key', None)
+        if key is None:
+            return target
+
+        # Targets are resolved in the order they were submitted, so the
+        # first one with a content gets its result and the others the cache.
+        result = self.pending.pop(key, None)
+        if result is not None:
+            docstrings, timings = result.get()
+            if docstrings is not None:
+                self.cache.set(key, docstrings)
+            if timings is not None:
+                target['timings'].add(timings)
+        docstrings = self.cache.get(key)
+        if docstrings is not None:
+            target['docstrings'] = docstrings
+
+        return target
+
+
+def get_shared_docstrings(args, path, omissions, timed=False):
+    """Return SharedDocstrings if docstrings are generated with a cache, or None.
+
+    :param args: Options
+    :param path: Path to template directory
+    :param omissions: Names of first argument to omit
+    :param timed: Time reading and generating
+    """
+    if getattr(args, 'coverage', False) or getattr(args, 'line', None) is not None:
+        return None
+    if getattr(args, 'ranges', None):
+        return None
+    if getattr(args, 'check', False) and not getattr(args, 'diff', False):
+        return None
+
+    cache = get_cache(args, path, omissions)
+    if cache is None:
+        return None
+
+    generator = functools.partial(
+        get_docstrings,
+        path=path,
+        omissions=omissions,
+        ignore_exception=args.ignore_exception,
+        ignore_yield=args.ignore_yield,
+        ignore_init=args.ignore_init,
+        parser=getattr(args, 'parser', 'auto'),
+    )
+
+    return SharedDocstrings(cache, generator, *get_bounds(args), timed=timed)
+
+
+def get_jobs(jobs):
+    if jobs is None or jobs < 1:
+        return os.cpu_count() or 1
+
+    return jobs
+
+
+def wait_output(target, result, worker, shared=None):
+    """Return ``(target, output)`` once the output of target submitted to pool is ready.
+
+    :param target: Target
+    :param result: AsyncResult of worker, or None with shared
+    :param worker: Callable which turns a target into its output
+    :param shared: SharedDocstrings target was submitted to, or None
+    """
+    if shared is None:
+        return target, result.get()
+
+    target = shared.resolve(target)
+    return target, worker(target)
+
+
+def iter_outputs(targets, worker, jobs=1, shared=None):
+    """Yield ``(target, output)`` pairs in the order of ``targets``.
+
+    ``targets`` is consumed lazily. With more than one job at most
+    ``jobs * MAX_IN_FLIGHT_PER_JOB`` targets are pending at any time.
+
+    :param targets: Iterable of targets
+    :param worker: Callable which turns a target into its output
+    :param jobs: Number of processes
+    :param shared: SharedDocstrings to generate docstrings with in the pool,
+                   running worker in this process. Used with more than one job
+    """
+    jobs = get_jobs(jobs)
+    if jobs <= 1:
+        for target in targets:
+            yield target, worker(target)
+
+        return
+
+    pending = collections.deque()
+    limit = jobs * MAX_IN_FLIGHT_PER_JOB
+    import multiprocessing
+
+    with multiprocessing.Pool(processes=jobs, maxtasksperchild=MAX_TASKS_PER_CHILD) as pool:
+        for target in targets:
+            if shared is None:
+                pending.append((target, pool.apply_async(worker, (target,))))
+            else:
+                pending.append((shared.submit(pool, target), None))
+            if len(pending) >= limit:
+                yield wait_output(*pending.popleft(), worker=worker, shared=shared)
+
+        while pending:
+            yield wait_output(*pending.popleft(), worker=worker, shared=shared)
+
+
+def get_cache(args, path, omissions):
+    if not getattr(args, 'cache', False):
+        return None
+
+    from doq.cache import (
+        get_cache_dir,
+        ResultCache,
+    )
+
+    # ``indent`` and ``style`` are applied after the cached stage, so
+    # they are not part of the key.
+    cache = ResultCache(
+        directory=getattr(args, 'cache_dir', None) or get_cache_dir(),
+        template_path=path,
+        options={
+            'omissions': omissions,
+            'ignore_exception': args.ignore_exception,
+            'ignore_yield': args.ignore_yield,
+            'ignore_init': args.ignore_init,
+            'parser': getattr(args, 'parser', 'auto'),
+        },
+    )
+    cache.prune()
+
+    return cache
+
+
+def get_stats(args):
+    per_file = getattr(args, 'profile', False)
+    if not per_file and not getattr(args, 'stats', False):
+        return None
+
+    return RunStats(per_file=per_file)
+
+
+def write_outputs(outputs, writer=None, stats=None, flush=False, fail_fast=False):
+    """Write outputs to their files or stdout.
+
+    Return whether any target was processed and the number of outputs.
+
+    :param outputs: Iterable of ``(target, output)`` pairs, with timings of
+                    the worker next to output when stats are collected
+    :param writer: FileWriter to edit files in-place, or None to write to stdout
+    :param stats: RunStats or None
+    :param flush: Flush stdout after each output
+    :param fail_fast: Stop after the first output
+    """
+    processed = False
+    count = 0
+    for target, output in outputs:
+        processed = True
+        timings = None
+        if stats is not None:
+            output, timings = output
+
+        if output is not None:
+            count += 1
+            with timer(timings, 'write'):
+                if writer is not None and target['path'] != '<stdin>':
+                    writer.write(target['path'], output + '\n')
+                else:
+                    sys.stdout.write(output + '\n')
+                    if flush:
+                        # Let consumers read results while the run goes on.
+                        sys.stdout.flush()
+
+        if stats is not None:
+            stats.add(target['path'], timings, skipped=output is None)
+        if fail_fast and output is not None:
+            break
+
+    return processed, count
+
+
+def report_coverage(args, outputs, stats=None):
+    """Print docstring coverage of targets and tell whether it is at least --fail_under.
+
+    Return whether any target was processed and whether coverage passed.
+
+    :param args: Options
+    :param outputs: Iterable of ``(target, counts)`` pairs, with timings of
+                    the worker next to counts when stats are collected
+    :param stats: RunStats or None
+    """
+    from doq.coverage import Coverage
+
+    coverage = Coverage(
+        basedir=args.directory if args.recursive else None,
+        display=get_display_path,
+    )
+    processed = False
+    for target, counts in outputs:
+        processed = True
+        timings = None
+        if stats is not None:
+            counts, timings = counts
+        if counts is not None:
+            coverage.add(target['path'], *counts)
+        if stats is not None:
+            stats.add(target['path'], timings, skipped=counts is None)
+
+    if not processed:
+        return False, False
+
+    sys.stdout.write(coverage.format(args.style) + '\n')
+    fail_under = getattr(args, 'fail_under', None)
+    if fail_under is not None and coverage.percent < fail_under:
+        sys.stderr.write('Docstring coverage {0:.1f}% is below {1}%\n'.format(coverage.percent, fail_under))
+        return True, False
+
+    return True, True
+
+
+def write_stats(args, stats, changed):
+    if stats is None:
+        return
+
+    stats.finish(changed)
+    stats.write(sys.stderr, style=getattr(args, 'stats_style', 'text'))
+
+
+def get_worker(args, path, omissions):
+    """Return the function turning a target into its output.
+
+    :param args: Options
+    :param path: Path to template directory
+    :param omissions: Names of first argument to omit
+    """
+    start, end = get_bounds(args)
+    if getattr(args, 'coverage', False):
+        return functools.partial(
+            count_target,
+            ignore_init=args.ignore_init,
+            start=start,
+            end=end,
+            parser=getattr(args, 'parser', 'auto'),
+        )
+
+    check = getattr(args, 'check', False)
+    diff = getattr(args, 'diff', False)
+    if check and not diff:
+        # Nothing needs to be rendered to tell what is missing.
+        return functools.partial(
+            check_target,
+            omissions=omissions,
+            ignore_init=args.ignore_init,
+            start=start,
+            end=end,
+            parser=getattr(args, 'parser', 'auto'),
+            ranges=getattr(args, 'ranges', None),
+            line=getattr(args, 'line', None),
+        )
+
+    worker = functools.partial(
+        format_target,
+        path=path,
+        style='string' if diff else args.style,
+        indent=args.indent,
+        omissions=omissions,
+        ignore_exception=args.ignore_exception,
+        ignore_yield=args.ignore_yield,
+        ignore_init=args.ignore_init,
+        start=start,
+        end=end,
+        cache=get_cache(args, path, omissions),
+        ranges=getattr(args, 'ranges', None),
+        parser=getattr(args, 'parser', 'auto'),
+        line=getattr(args, 'line', None),
+    )
+    if diff:
+        return functools.partial(diff_target, worker=worker, start=start)
+
+    return worker
 
 
 def run(args):
-    targets = get_targets(args)
     path = get_template_path(
         template_path=args.template_path,
         formatter=args.formatter,
@@ -207,53 +1014,77 @@ def run(args):
         return False
 
     omissions = args.omit.split(',') if args.omit else None
+    worker = get_worker(args, path, omissions)
+    check = getattr(args, 'check', False)
+    in_place = args.write and not check and not getattr(args, 'diff', False)
+    stats = get_stats(args)
+    targets = iter_targets(args)
+    if stats is not None:
+        worker = functools.partial(format_target_with_timings, worker=worker)
+        targets = stats.timings.iterate(targets, 'discover')
+
+    jobs = getattr(args, 'jobs', 1) if args.recursive else 1
+    if getattr(args, 'coverage', False):
+        with contextlib.closing(iter_outputs(targets, worker, jobs=jobs)) as outputs:
+            processed, passed = report_coverage(args, outputs, stats)
+        write_stats(args, stats, 0)
+
+        return passed if processed else None
+
+    shared = get_shared_docstrings(args, path, omissions, timed=stats is not None) if jobs != 1 else None
+    writer = FileWriter(fsync=getattr(args, 'fsync', 'none'))
+    try:
+        with contextlib.closing(iter_outputs(targets, worker, jobs=jobs, shared=shared)) as outputs:
+            processed, changed = write_outputs(
+                outputs,
+                writer=writer if in_place else None,
+                stats=stats,
+                flush=args.style == 'jsonl',
+                fail_fast=check and getattr(args, 'fail_fast', False),
+            )
+    finally:
+        writer.close()
 
-    if not targets:
+    if in_place and processed:
+        changed = len(writer.changed)
+    if (in_place or check) and processed:
+        message = 'changed' if in_place else 'missing docstrings'
+        sys.stderr.write('{0} file{1} {2}\n'.format(changed, '' if changed == 1 else 's', message))
+
+    write_stats(args, stats, changed)
+    if not processed:
         return
 
-    for target in targets:
-        docstrings = generate_docstrings(
-            code=target['lines'],
-            path=path,
-            omissions=omissions,
-            ignore_exception=args.ignore_exception,
-            ignore_yield=args.ignore_yield,
-            ignore_init=args.ignore_init,
-        )
-        if len(docstrings) == 0:
-            continue
+    return not (check and changed)
 
-        if args.style == 'json':
-            outputter = JSONOutputter()
-        else:
-            outputter = StringOutptter()
 
-        output = outputter.format(
-            lines=target['lines'],
-            docstrings=docstrings,
-            indent=args.indent,
-        )
+def get_shtab(completion=False):
+    """Return shtab, or a stand-in unless completion is to be printed.
 
-        if args.write and target['path'] != '<stdin>':
-            with open(target['path'], 'w') as f:
-                f.write(output + '\n')
+    shtab is only needed to print completion scripts and costs startup time.
 
-        else:
-            sys.stdout.write(output + '\n')
+    :param completion: Whether --print-completion is given
+    """
+    if completion:
+        try:
+            import shtab
 
-    return True
+            return shtab
+        except ImportError:
+            pass
+
+    from doq import _shtab
 
+    return _shtab
 
-def parse_options():
+
+def build_parser(completion=False):
     parser = argparse.ArgumentParser(
         prog='doq',
         description='Docstring generator.',
         add_help=True,
     )
-    try:
-        import shtab
-    except ImportError:
-        from . import _shtab as shtab
+    shtab = get_shtab(completion)
     shtab.add_argument_to(parser)
     parser.add_argument(
         '-f',
@@ -274,6 +1105,20 @@ def parse_options():
         default=0,
         help='End lineno',
     )
+    parser.add_argument(
+        '--ranges',
+        type=parse_ranges,
+        default=None,
+        help='Comma separated line ranges such as 10-20,140-180. '
+             'Parse whole file and generate docstrings for defs intersecting them',
+    )
+    parser.add_argument(
+        '--line',
+        type=int,
+        default=None,
+        help='Generate docstring of the innermost def or class spanning lineno '
+             'without docstring only',
+    )
     parser.add_argument(
         '-t',
         '--template_path',
@@ -286,7 +1131,7 @@ def parse_options():
         '--style',
         type=str,
         default='string',
-        help='Output style string or json',
+        help='Output style string, json or jsonl (one object per docstring with the path of file)',
     )
     parser.add_argument(
         '--formatter',
@@ -318,12 +1163,75 @@ def parse_options():
         default='',
         help='Path to directory',
     ).complete = shtab.DIR
+    parser.add_argument(
+        '--include',
+        default=None,
+        help='Comma separated globs of file names to process with --recursive. Default is *.py',
+    )
+    parser.add_argument(
+        '--exclude',
+        default=None,
+        help='Comma separated globs of file or directory names, or paths relative to --directory, to skip',
+    )
+    parser.add_argument(
+        '--gitignore',
+        action='store_true',
+        default=False,
+        help='Skip paths ignored by .gitignore files',
+    )
+    parser.add_argument(
+        '--git',
+        action='store_true',
+        default=False,
+        help='List files with git ls-files, falling back to reading directories outside a repository',
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of processes to use with --recursive',
+    )
     parser.add_argument(
         '-w',
         '--write',
         action='store_true',
         help='Edit files in-place',
     )
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help='List defs and classes without docstring instead of generating them. Exit with 1 if any',
+    )
+    parser.add_argument(
+        '--fail_fast',
+        action='store_true',
+        help='Stop --check at the first file with missing docstrings',
+    )
+    parser.add_argument(
+        '--coverage',
+        action='store_true',
+        help='Report numbers of documented defs and classes of each module and package. '
+             'Output style is string or json',
+    )
+    parser.add_argument(
+        '--fail_under',
+        type=float,
+        default=None,
+        help='Exit with 1 if --coverage is below this percentage',
+    )
+    parser.add_argument(
+        '--diff',
+        action='store_true',
+        help='Print unified diffs instead of generated code. Exit with 1 on differences with --check',
+    )
+    parser.add_argument(
+        '--fsync',
+        choices=FSYNC_POLICIES,
+        default='none',
+        help='When to fsync files written with --write: none, file (each file) '
+             'or batch (all files once at the end)',
+    )
     parser.add_argument(
         '-v',
         '--version',
@@ -337,6 +1245,44 @@ def parse_options():
         default=None,
         help='Path to a setup.cfg or pyproject.toml',
     ).complete = shtab.FILE
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='Reuse results of unchanged files from previous runs. Results not reused for 30 days are removed',
+    )
+    parser.add_argument(
+        '--cache_dir',
+        default=None,
+        help='Path to cache directory. Default is $XDG_CACHE_HOME/doq',
+    ).complete = shtab.DIR
+    parser.add_argument(
+        '--parser',
+        choices=PARSERS,
+        default='auto',
+        help='Parser to use. auto uses the ast module, falling back to parso for code which does not compile. '
+             'ast skips such files, reporting them to stderr',
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Print time spent in each phase, file counts, throughput and peak RSS to stderr',
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Like --stats, with timings of each file',
+    )
+    parser.add_argument(
+        '--stats_style',
+        choices=STATS_STYLES,
+        default='text',
+        help='Style of --stats and --profile output, text or json',
+    )
+    parser.add_argument(
+        '--cprofile',
+        default=None,
+        help='Dump cProfile statistics of the main process to path. Use -j 1 to include parsing and rendering',
+    ).complete = shtab.FILE
     parser.add_argument(
         '--ignore_exception',
         action='store_true',
@@ -353,19 +1299,32 @@ def parse_options():
         help='Ignore generate docstring to __init__ method',
     )
 
-    args = parser.parse_args()
+    return parser
+
+
+def parse_options(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser(completion=any(a.startswith('--print-completion') for a in argv))
+    args = parser.parse_args(argv)
     configs = find_config(args)
     if configs:
         parser.set_defaults(**configs)
-        args = parser.parse_args()
+        args = parser.parse_args(argv)
 
     return args
 
 
-def main():
-    args = parse_options()
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv in (['-v'], ['--version']):
+        # Answer without building the parser or looking up configs.
+        sys.stdout.write('doq {0}\n'.format(__version__))
+        sys.exit(0)
+
+    args = parse_options(argv)
     try:
-        ret = run(args)
+        with profile(getattr(args, 'cprofile', None)):
+            ret = run(args)
         if ret:
             sys.exit(0)
 
@@ -0,0 +1,130 @@
+import errno
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+
+def get_socket_path():
+    path = os.environ.get('DOQD_SOCKET')
+    if path:
+        return path
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if not runtime_dir:
+        # The temporary directory is shared with other users, so the socket
+        # goes in a directory doqd creates for the current user only.
+        runtime_dir = os.path.join(tempfile.gettempdir(), 'doqd-{0}'.format(os.getuid()))
+
+    return os.path.join(runtime_dir, 'doqd.sock')
+
+
+def check_socket_dir(directory):
+    """Raise PermissionError if other users could replace entries of directory.
+
+    Directories must belong to the current user or root, and be writable by
+    nobody else unless the sticky bit keeps others from removing entries.
+
+    :param directory: Path to directory
+    """
+    st = os.stat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid not in (0, os.getuid()) or \
+            (st.st_mode & 0o022 and not st.st_mode & stat.S_ISVTX):
+        raise PermissionError(errno.EPERM, 'Directory can be changed by other users', directory)
+
+
+def check_socket(path):
+    """Raise PermissionError unless path is a socket of the current user.
+
+    Otherwise source would be sent to whoever created path.
+
+    :param path: Path to doqd socket
+    """
+    check_socket_dir(os.path.dirname(os.path.abspath(path)))
+    st = os.lstat(path)
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(errno.EPERM, 'Not a socket of the current user', path)
+
+
+def reads_stdin(argv):
+    """Whether doq would read source from STDIN with given arguments.
+
+    :param argv: Arguments without program name
+    """
+    for i, arg in enumerate(argv):
+        if arg in ('-r', '--recursive'):
+            return False
+        if arg in ('-f', '--file'):
+            return i + 1 < len(argv) and argv[i + 1] == '-'
+        if arg.startswith('--file='):
+            return arg == '--file=-'
+        if arg.startswith('-f') and not arg.startswith('--'):
+            return arg == '-f-'
+
+    return True
+
+
+def recv_all(conn):
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+
+    return b''.join(chunks)
+
+
+def request(argv, stdin='', cwd=None, path=None):
+    """Send arguments to doqd and return its response.
+
+    :param argv: Arguments without program name
+    :param stdin: Source passed as STDIN
+    :param cwd: Directory relative paths are resolved against
+    :param path: Path to doqd socket
+    """
+    payload = json.dumps({
+        'argv': argv,
+        'stdin': stdin,
+        'cwd': cwd or os.getcwd(),
+    }).encode('utf-8')
+    path = path or get_socket_path()
+    check_socket(path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        conn.sendall(payload)
+        conn.shutdown(socket.SHUT_WR)
+        response = recv_all(conn)
+
+    return json.loads(response.decode('utf-8'))
+
+
+def main():
+    # Keep this free of doq.cli imports; the daemon has them warm already.
+    argv = sys.argv[1:]
+    stdin = ''
+    if reads_stdin(argv) and not sys.stdin.isatty():
+        stdin = sys.stdin.read()
+
+    try:
+        response = request(argv, stdin)
+    except (FileNotFoundError, ConnectionRefusedError, PermissionError):
+        from io import StringIO
+
+        from doq.cli import main as doq_main
+
+        if stdin:
+            sys.stdin = StringIO(stdin)
+            sys.stdin.name = '<stdin>'
+        sys.argv = ['doq'] + argv
+        return doq_main()
+
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    sys.exit(response['code'])
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,8 @@ from configparser import ConfigParser as SafeConfigParser
 
 PROJECT_CONFIGS = ('setup.cfg', 'pyproject.toml')
 
+_configs = {}
+
 
 def read_setup_cfg(filepath):
     try:
@@ -27,6 +29,29 @@ def read_pyproject_toml(filepath):
     return config.get('tool').get('doq')
 
 
+def read_config(reader, filepath):
+    """Read config file once per modification.
+
+    Long running processes such as doqd pick up edits without re-reading
+    unchanged files on every request.
+
+    :param reader: read_setup_cfg or read_pyproject_toml
+    :param filepath: Path to config file
+    """
+    try:
+        mtime = os.stat(filepath).st_mtime_ns
+    except OSError:
+        return reader(filepath)
+
+    key = (reader.__name__, filepath)
+    cached = _configs.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, reader(filepath))
+        _configs[key] = cached
+
+    return cached[1]
+
+
 def get_config_from_setup_cfg(configs, args):
     defaults = {}
     current_args = vars(args)
@@ -73,7 +98,7 @@ def find_config(args):
     paths = [os.path.abspath(args.config)] if args.config else find_config_path()
     for filepath in paths:
         if filepath.endswith('setup.cfg'):
-            configs = read_setup_cfg(filepath)
+            configs = read_config(read_setup_cfg, filepath)
             if not configs.has_section('doq'):
                 continue
 
@@ -81,7 +106,7 @@ def find_config(args):
             break
 
         if filepath.endswith('pyproject.toml'):
-            defaults = read_pyproject_toml(filepath)
+            defaults = read_config(read_pyproject_toml, filepath)
             if not defaults:
                 continue
 
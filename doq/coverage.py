@@ -0,0 +1,96 @@
+import json
+import os
+
+
+def get_percent(documented, total):
+    return 100.0 * documented / total if total else 100.0
+
+
+def get_summary(documented, total):
+    return {
+        'documented': documented,
+        'missing': total - documented,
+        'total': total,
+        'coverage': get_percent(documented, total),
+    }
+
+
+class Coverage:
+    """Docstring coverage of modules and the packages they are in.
+
+    Counts of a package include every module below it.
+
+    :param basedir: Directory modules were found in, or None for a single file
+    :param display: Function turning an absolute path into the name to report
+    """
+
+    def __init__(self, basedir=None, display=None):
+        self.basedir = os.path.abspath(basedir) if basedir is not None else None
+        self.display = display or (lambda path: path)
+        self.modules = {}
+
+    def add(self, path, documented, total):
+        self.modules[path] = (documented, total)
+
+    @property
+    def documented(self):
+        return sum(d for d, _ in self.modules.values())
+
+    @property
+    def total(self):
+        return sum(t for _, t in self.modules.values())
+
+    @property
+    def percent(self):
+        return get_percent(self.documented, self.total)
+
+    def get_packages(self):
+        packages = {}
+        if self.basedir is None:
+            return packages
+
+        for path, (documented, total) in self.modules.items():
+            directory = os.path.dirname(path)
+            while len(directory) >= len(self.basedir):
+                d, t = packages.get(directory, (0, 0))
+                packages[directory] = (d + documented, t + total)
+                directory = os.path.dirname(directory)
+
+        return packages
+
+    def to_dict(self):
+        return {
+            'modules': {
+                self.display(path): get_summary(*counts)
+                for path, counts in sorted(self.modules.items())
+            },
+            'packages': {
+                os.path.join(self.display(path), ''): get_summary(*counts)
+                for path, counts in sorted(self.get_packages().items())
+            },
+            'total': get_summary(self.documented, self.total),
+        }
+
+    def format(self, style='string'):
+        report = self.to_dict()
+        if style == 'json':
+            return json.dumps(report)
+
+        rows = [list(report['modules'].items()), list(report['packages'].items())]
+        rows = [r for r in rows if r] + [[('TOTAL', report['total'])]]
+        width = max(len(name) for section in rows for name, _ in section)
+        width = max(width, len('Name'))
+        header = '{0:<{1}} {2:>8} {3:>8} {4:>8}'.format('Name', width, 'Total', 'Missing', 'Cover')
+        lines = [header]
+        for section in rows:
+            lines.append('-' * len(header))
+            for name, summary in section:
+                lines.append('{0:<{1}} {2:>8} {3:>8} {4:>7.1f}%'.format(
+                    name,
+                    width,
+                    summary['total'],
+                    summary['missing'],
+                    summary['coverage'],
+                ))
+
+        return '\n'.join(lines)
@@ -0,0 +1,279 @@
+import fnmatch
+import os
+import re
+
+DEFAULT_INCLUDE = ('*.py',)
+
+
+def split_patterns(value):
+    """Split comma separated glob patterns such as ``build,*_pb2.py``.
+
+    :param value: String, sequence of patterns or None
+    """
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = value.split(',')
+
+    return tuple(p.strip() for p in value if p.strip())
+
+
+def compile_patterns(patterns):
+    """Compile globs into a single regex, or None if there are no globs.
+
+    :param patterns: Sequence of globs
+    """
+    if not patterns:
+        return None
+
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns))
+
+
+def translate_gitignore(pattern):  # noqa C901
+    """Translate a .gitignore glob into a regex matching relative paths.
+
+    :param pattern: Glob without negation and trailing slash
+    """
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    i = 0
+    regex = ''
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            regex += '/.*'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            chars = pattern[i + 1:end]
+            if chars[0] == '!':
+                chars = '^' + chars[1:]
+            regex += '[{0}]'.format(chars.replace('\\', '\\\\'))
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+
+    return re.compile(regex + r'\Z')
+
+
+class Gitignore:
+    """Rules of a single .gitignore file.
+
+    :param directory: Directory the file is in
+    :param lines: Lines of the file
+    """
+
+    def __init__(self, directory, lines):
+        self.directory = directory
+        self.prefix = len(os.path.join(directory, ''))
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip(' ')
+            if not line or line.startswith('#'):
+                continue
+
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            if line.startswith('\\'):
+                line = line[1:]
+
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if line:
+                self.rules.append((translate_gitignore(line), negate, dir_only))
+
+    @classmethod
+    def load(cls, directory):
+        try:
+            with open(os.path.join(directory, '.gitignore')) as f:
+                return cls(directory, f.readlines())
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def match(self, path, is_dir):
+        """Return True if ignored, False if re-included, None if no rule matches.
+
+        :param path: Absolute path
+        :param is_dir: Whether path is a directory
+        """
+        relpath = path[self.prefix:].replace(os.sep, '/')
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relpath):
+                return not negate
+
+        return None
+
+
+def is_ignored(gitignores, path, is_dir):
+    # Rules of deeper files take precedence.
+    for gitignore in reversed(gitignores):
+        matched = gitignore.match(path, is_dir)
+        if matched is not None:
+            return matched
+
+    return False
+
+
+def get_parent_gitignores(directory):
+    """Load .gitignore files from the root of the git work tree down to directory.
+
+    The directory itself is excluded. Nothing is loaded outside a work tree.
+
+    :param directory: Absolute path
+    """
+    parents = []
+    current = directory
+    while True:
+        parent = os.path.dirname(current)
+        if os.path.exists(os.path.join(current, '.git')) or parent == current:
+            break
+        current = parent
+        parents.append(current)
+
+    if not os.path.exists(os.path.join(current, '.git')):
+        return ()
+
+    gitignores = (Gitignore.load(p) for p in reversed(parents))
+    return tuple(g for g in gitignores if g is not None)
+
+
+class FileFinder:
+    """Find python files below a directory.
+
+    Directories are read lazily with ``os.scandir``, so processing starts
+    as soon as the first file is found and excluded trees are never read.
+    Directories starting with a dot are always skipped.
+
+    :param include: Globs of file names to yield
+    :param exclude: Globs of file or directory names, or paths relative to
+                    the base directory, to skip
+    :param gitignore: Skip paths ignored by .gitignore files
+    :param git: List files with ``git ls-files`` instead of reading directories
+    """
+
+    def __init__(self, include=None, exclude=None, gitignore=False, git=False):
+        self.include = compile_patterns(split_patterns(include) or DEFAULT_INCLUDE)
+        self.exclude = compile_patterns(split_patterns(exclude))
+        self.gitignore = gitignore
+        self.git = git
+
+    def is_included(self, name):
+        return self.include.match(name) is not None
+
+    def is_excluded(self, name, relpath):
+        if self.exclude is None:
+            return False
+
+        return self.exclude.match(name) is not None or self.exclude.match(relpath) is not None
+
+    def iter_files(self, basedir):
+        basedir = os.path.abspath(basedir)
+        if self.git:
+            files = self.iter_git_files(basedir)
+            if files is not None:
+                yield from files
+                return
+
+        yield from self.walk(basedir)
+
+    def walk(self, basedir):  # noqa C901
+        prefix = len(os.path.join(basedir, ''))
+        visited = set()
+        gitignores = get_parent_gitignores(basedir) if self.gitignore else ()
+        stack = [(basedir, gitignores)]
+        while stack:
+            directory, gitignores = stack.pop()
+            try:
+                # Symbolic links are followed, so guard against loops.
+                st = os.stat(directory)
+                if (st.st_dev, st.st_ino) in visited:
+                    continue
+                visited.add((st.st_dev, st.st_ino))
+
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+
+            if self.gitignore:
+                gitignore = Gitignore.load(directory)
+                if gitignore is not None:
+                    gitignores = gitignores + (gitignore,)
+
+            directories = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+
+                if is_dir and entry.name.startswith('.'):
+                    continue
+                if self.is_excluded(entry.name, entry.path[prefix:].replace(os.sep, '/')):
+                    continue
+                if gitignores and is_ignored(gitignores, entry.path, is_dir):
+                    continue
+
+                if is_dir:
+                    directories.append(entry.path)
+                elif self.is_included(entry.name):
+                    yield entry.path
+
+            for path in reversed(directories):
+                stack.append((path, gitignores))
+
+    def iter_git_files(self, basedir):
+        """Return files known to git which are not ignored, or None outside a work tree.
+
+        :param basedir: Absolute path
+        """
+        import subprocess
+
+        try:
+            output = subprocess.run(
+                ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                cwd=basedir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                check=True,
+            ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+        return self.filter_git_files(basedir, output.decode('utf-8', 'surrogateescape').split('\0'))
+
+    def filter_git_files(self, basedir, relpaths):
+        for relpath in relpaths:
+            if not relpath:
+                continue
+
+            parts = relpath.split('/')
+            if any(p.startswith('.') for p in parts[:-1]):
+                continue
+            if not self.is_included(parts[-1]):
+                continue
+            if any(self.is_excluded(p, '/'.join(parts[:i + 1])) for i, p in enumerate(parts)):
+                continue
+
+            path = os.path.join(basedir, *parts)
+            # Deleted files are still listed until the deletion is staged.
+            if os.path.isfile(path):
+                yield path
@@ -0,0 +1,78 @@
+from itertools import takewhile
+
+
+class _Node:
+    __slots__ = ('center', 'by_begin', 'by_end', 'left', 'right')
+
+    def __init__(self, center, intervals, left, right):
+        self.center = center
+        self.by_begin = sorted(intervals, key=lambda i: i[0])
+        self.by_end = sorted(intervals, key=lambda i: i[1], reverse=True)
+        self.left = left
+        self.right = right
+
+
+class IntervalTree:
+    """Static centered interval tree over closed intervals.
+
+    Queries cost ``O(log n + k)`` where ``k`` is the number of intervals
+    found.
+
+    :param intervals: Iterable of ``(begin, end, value)``
+    """
+
+    def __init__(self, intervals):
+        self.intervals = [
+            (begin, end, i, value)
+            for i, (begin, end, value) in enumerate(intervals)
+        ]
+        self.root = self._build(self.intervals)
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+
+        points = sorted(p for i in intervals for p in i[:2])
+        center = points[len(points) // 2]
+        left = [i for i in intervals if i[1] < center]
+        right = [i for i in intervals if i[0] > center]
+        here = [i for i in intervals if i[0] <= center <= i[1]]
+
+        return _Node(center, here, self._build(left), self._build(right))
+
+    def overlap(self, begin, end):
+        """Return values of intervals which intersect ``[begin, end]``.
+
+        Values are returned in the order they were given.
+
+        :param begin: First point of range
+        :param end: Last point of range
+        """
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+
+            if end < node.center:
+                # Every interval here ends at or after center.
+                found += takewhile(lambda i: i[0] <= end, node.by_begin)
+                stack.append(node.left)
+            elif begin > node.center:
+                # Every interval here begins at or before center.
+                found += takewhile(lambda i: i[1] >= begin, node.by_end)
+                stack.append(node.right)
+            else:
+                found += node.by_begin
+                stack.append(node.left)
+                stack.append(node.right)
+
+        return [i[3] for i in sorted(found, key=lambda i: i[2])]
+
+    def at(self, point):
+        """Return values of intervals which contain ``point``.
+
+        :param point: Point to look up
+        """
+        return self.overlap(point, point)
@@ -0,0 +1,169 @@
+import sys
+
+
+def intern(value):
+    return None if value is None else sys.intern(value)
+
+
+class Model:
+    """Base of the slotted types doq passes from parsing to output.
+
+    Fields can be read by key as well, like the dicts these types replace,
+    so templates and outputters work with either.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        """Return field by name."""
+        if key not in self.__slots__:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        """Tell whether type has field."""
+        return key in self.__slots__
+
+    def __eq__(self, other):
+        """Compare type and fields."""
+        if type(self) is not type(other):
+            return NotImplemented
+
+        return all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __repr__(self):
+        """Return fields as keyword arguments."""
+        fields = ', '.join('{0}={1!r}'.format(k, getattr(self, k)) for k in self.__slots__)
+        return '{0}({1})'.format(type(self).__name__, fields)
+
+    def keys(self):
+        return self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def to_dict(self):
+        result = {}
+        for key in self.__slots__:
+            value = getattr(self, key)
+            if isinstance(value, (list, tuple)):
+                value = [v.to_dict() if isinstance(v, Model) else v for v in value]
+            result[key] = value
+
+        return result
+
+
+class Param(Model):
+    __slots__ = ('argument', 'annotation', 'default')
+
+    def __init__(self, argument, annotation=None, default=None):
+        self.argument = intern(argument)
+        self.annotation = intern(annotation)
+        self.default = intern(default)
+
+
+class FunctionSignature(Model):
+    __slots__ = (
+        'name',
+        'params',
+        'return_type',
+        'start_lineno',
+        'start_col',
+        'end_lineno',
+        'end_col',
+        'is_doc_exists',
+        'exceptions',
+        'yields',
+        'is_async',
+        'is_classmethod',
+        'is_staticmethod',
+    )
+
+    def __init__(self, name, params, return_type, start_lineno, start_col, end_lineno, end_col, is_doc_exists,
+                 is_async=False, is_classmethod=False, is_staticmethod=False):
+        self.name = intern(name)
+        self.params = params
+        self.return_type = intern(return_type)
+        self.start_lineno = start_lineno
+        self.start_col = start_col
+        self.end_lineno = end_lineno
+        self.end_col = end_col
+        self.is_doc_exists = is_doc_exists
+        # Most defs neither raise nor yield, so they share an empty tuple.
+        self.exceptions = ()
+        self.yields = ()
+        self.is_async = is_async
+        self.is_classmethod = is_classmethod
+        self.is_staticmethod = is_staticmethod
+
+    def add(self, key, value):
+        """Append to exceptions or yields.
+
+        :param key: exceptions or yields
+        :param value: Exception or yielded value
+        """
+        values = getattr(self, key)
+        if not values:
+            values = []
+            setattr(self, key, values)
+        values.append(intern(value))
+
+
+class ClassSignature(Model):
+    __slots__ = (
+        'name',
+        'defs',
+        'start_lineno',
+        'start_col',
+        'end_lineno',
+        'end_col',
+        'is_doc_exists',
+    )
+
+    def __init__(self, name, start_lineno, start_col, end_lineno, end_col, is_doc_exists):
+        self.name = intern(name)
+        self.defs = []
+        self.start_lineno = start_lineno
+        self.start_col = start_col
+        self.end_lineno = end_lineno
+        self.end_col = end_col
+        self.is_doc_exists = is_doc_exists
+
+
+class DocstringEdit(Model):
+    """Docstring to insert below the signature of a def or class."""
+
+    __slots__ = (
+        'docstring',
+        'start_lineno',
+        'start_col',
+        'end_lineno',
+        'end_col',
+    )
+
+    def __init__(self, docstring, start_lineno, start_col, end_lineno, end_col):
+        self.docstring = docstring
+        self.start_lineno = start_lineno
+        self.start_col = start_col
+        self.end_lineno = end_lineno
+        self.end_col = end_col
+
+
+class DocstringInsertion(Model):
+    """Indented docstring and the line of source it is inserted after."""
+
+    __slots__ = (
+        'docstring',
+        'line',
+        'column',
+        'start_lineno',
+        'end_lineno',
+    )
+
+    def __init__(self, docstring, line, column, start_lineno, end_lineno):
+        self.docstring = docstring
+        self.line = line
+        self.column = column
+        self.start_lineno = start_lineno
+        self.end_lineno = end_lineno
@@ -1,56 +1,142 @@
 import json
 import re
 
+from doq.source import Source
+
+# End of a signature, with or without return type:
+#   def foo(a, b):
+#   def foo(a, b) :
+#   def foo(a, b) -> int:
+#   def foo(a, b) -> Tuple[
+#       int,
+#   ]:
+SIGNATURE_END = re.compile(r'\)\s*:|\]\s*:|->.*:')
+
+
+def get_text(lines, start, end):
+    if isinstance(lines, Source):
+        return lines.get_text(start, end)
+
+    return '\n'.join(lines[start:end])
+
 
 class BaseOutputter:
     def format(self, lines, docstrings, indent=None):
         raise NotImplementedError()
 
-
-class StringOutptter(BaseOutputter):
     def detect_insert_point(self, lines, start, end):
-        if lines[start - 1].endswith(':') or re.search(r'\):', lines[start - 1]):
+        if lines[start - 1].endswith(':') or '):' in lines[start - 1]:
             # Found end of signature
             return start
-        else:
-            for i, line in enumerate(lines[start:end]):
-                if line.endswith('):'):
-                    # Found end of signature without type
-                    return start + i + 1
-                elif re.search(r'\):|\)\s*:', line):
-                    return start + i + 1
-                elif re.search(r'\]:|\]\s*:', line):
-                    # Found end of signature type
-                    #   def foo(a, b) -> Tuple[
-                    #       int,
-                    #   ]:
-                    #       pass
-                    return start + i + 1
-                elif re.search(r'->(.*):', line):
-                    # Found end of signature with type
-                    return start + i + 1
+
+        for i, line in enumerate(lines[start:end]):
+            if SIGNATURE_END.search(line):
+                return start + i + 1
 
         return start
 
-    def format(self, lines, docstrings, indent=None):
+    def indent_docstring(self, docstring, col):
+        ret = []
+        for line in docstring.split('\n'):
+            if line == '':
+                ret.append('')
+            else:
+                ret.append('{0}{1}'.format(' ' * col, line))
+
+        return '\n'.join(ret)
+
+
+class StringOutptter(BaseOutputter):
+    def find_insert_point(self, lines, insertions, start, end):
+        """Find where docstring goes, given docstrings placed after it.
+
+        This is detect_insert_point applied to ``lines`` with ``insertions``
+        already inserted, without building that list. The result is a
+        ``(gap, position)`` pair: the docstring goes in front of
+        ``lines[gap]``, at ``position`` among docstrings already there.
+
+        :param lines: Original lines
+        :param insertions: Dict of gap to docstrings inserted there
+        :param start: Start lineno of signature
+        :param end: End lineno of signature
+        """
+        # Every insertion so far belongs to a later signature, so nothing
+        # before ``start`` has moved.
+        if lines[start - 1].endswith(':') or '):' in lines[start - 1]:
+            return start, 0
+
+        remaining = end - start
+        gap = start
+        while remaining > 0 and gap <= len(lines):
+            for position, text in enumerate(insertions.get(gap, ())):
+                if remaining <= 0:
+                    break
+                if SIGNATURE_END.search(text):
+                    return gap, position + 1
+                remaining -= 1
+
+            if remaining <= 0 or gap == len(lines):
+                break
+            if SIGNATURE_END.search(lines[gap]):
+                return gap + 1, 0
+            remaining -= 1
+            gap += 1
+
+        return start, 0
+
+    def get_insertions(self, lines, docstrings, indent=None):
+        """Return dict of gap to indented docstrings inserted in front of ``lines[gap]``.
+
+        Insert points are resolved from the last docstring to the first,
+        as if each was inserted into ``lines`` in turn.
+
+        :param lines: Lines of source
+        :param docstrings: Docstrings to insert
+        :param indent: Indent number
+        """
+        insertions = {}
+        docstrings = sorted(docstrings, key=lambda d: d['start_lineno'])
         for d in reversed(docstrings):
-            col = d['start_col'] + indent
-            ret = []
-            for line in d['docstring'].split('\n'):
-                if line == '':
-                    ret.append('')
-                else:
-                    ret.append('{0}{1}'.format(' ' * col, line))
-
-            lineno = self.detect_insert_point(
+            gap, position = self.find_insert_point(
                 lines,
+                insertions,
                 d['start_lineno'],
                 d['end_lineno'],
             )
+            text = self.indent_docstring(d['docstring'], d['start_col'] + indent)
+            insertions.setdefault(gap, []).insert(position, text)
+
+        return insertions
+
+    def iter_chunks(self, lines, docstrings, indent=None):
+        """Yield output in chunks to be joined by newlines.
 
-            lines.insert(lineno, '\n'.join(ret))
+        Source between docstrings is yielded as one chunk, sliced out of
+        the text of a Source rather than joined from its lines.
 
-        return '\n'.join(lines)
+        :param lines: Source or list of lines
+        :param docstrings: Docstrings to insert
+        :param indent: Indent number
+        """
+        insertions = self.get_insertions(lines, docstrings, indent)
+        current = 0
+        for gap in sorted(insertions.keys()):
+            if current < gap:
+                yield get_text(lines, current, gap)
+            yield from insertions[gap]
+            current = gap
+
+        if current < len(lines):
+            yield get_text(lines, current, len(lines))
+
+    def write(self, stream, lines, docstrings, indent=None):
+        for i, chunk in enumerate(self.iter_chunks(lines, docstrings, indent)):
+            if i:
+                stream.write('\n')
+            stream.write(chunk)
+
+    def format(self, lines, docstrings, indent=None):
+        return '\n'.join(self.iter_chunks(lines, docstrings, indent))
 
 
 class JSONOutputter(BaseOutputter):
@@ -58,15 +144,8 @@ class JSONOutputter(BaseOutputter):
         results = []
         for d in docstrings:
             col = d['start_col'] + indent
-            ret = []
-            for line in d['docstring'].split('\n'):
-                if line == '':
-                    ret.append('')
-                else:
-                    ret.append('{0}{1}'.format(' ' * col, line))
-
             results.append({
-                'docstring': '\n'.join(ret),
+                'docstring': self.indent_docstring(d['docstring'], col),
                 'start_col': col,
                 'start_lineno': d['start_lineno'],
                 'end_col': d['end_col'],
@@ -74,3 +153,31 @@ class JSONOutputter(BaseOutputter):
             })
 
         return json.dumps(results)
+
+
+class JSONLinesOutputter(BaseOutputter):
+    """One JSON object per docstring and line, carrying the path of file.
+
+    ``line`` is the line of the original file the docstring is inserted
+    after and ``column`` the indent of the docstring.
+
+    :param path: Path of file
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def format(self, lines, docstrings, indent=None):
+        results = []
+        for d in docstrings:
+            col = d['start_col'] + indent
+            results.append(json.dumps({
+                'path': self.path,
+                'line': self.detect_insert_point(lines, d['start_lineno'], d['end_lineno']),
+                'column': col,
+                'docstring': self.indent_docstring(d['docstring'], col),
+                'start_lineno': d['start_lineno'],
+                'end_lineno': d['end_lineno'],
+            }))
+
+        return '\n'.join(results)
@@ -1,13 +1,26 @@
+import functools
 import re
 
-import parso
+from doq.interval import IntervalTree
+from doq.models import (
+    ClassSignature,
+    FunctionSignature,
+    Param,
+)
+from doq.source import Source
 
+_grammar = None
 
-def sort_by_lineno(key):
-    if len(key['defs']):
-        return key['defs'][0]['start_lineno']
+PARSERS = ('auto', 'ast', 'parso')
 
-    return key['start_lineno']
+FUNC_CONTAINERS = frozenset([
+    'suite', 'simple_stmt', 'decorated', 'async_funcdef', 'async_stmt',
+    'if_stmt', 'while_stmt', 'for_stmt', 'try_stmt', 'with_stmt',
+])
+RAISE_CONTAINERS = frozenset([
+    'suite', 'simple_stmt', 'async_stmt',
+    'if_stmt', 'while_stmt', 'for_stmt', 'try_stmt', 'with_stmt',
+])
 
 
 def get_return_type(line):
@@ -21,22 +34,6 @@ def get_return_type(line):
     return None
 
 
-def get_start_col(line, start_col):
-    lines = line.split('\n')
-    for v in lines:
-        if v == '':
-            # Maybe line break only row
-            continue
-
-        index = v.find('def')
-        if index == start_col:
-            return start_col
-
-    # Maybe async keyword exists.
-    # parso does not parse by parso and it's known issue.
-    return start_col - 6  # 'async '
-
-
 def parse_return_type(code, start_lineno, end_lineno):
     lines = code.strip().split('\n')
     lineno = end_lineno - start_lineno
@@ -52,145 +49,389 @@ def parse_return_type(code, start_lineno, end_lineno):
     return None
 
 
-def parse_defs(module, omissions=None, ignore_exception=False, ignore_yield=False, ignore_init=False):  # noqa C901
-    if omissions is None:
-        omissions = []
+def get_decorator_name(decorator):
+    """Return the dotted name decorator starts with, such as ``functools.wraps``.
 
-    results = []
-    for d in module.iter_funcdefs():
-        is_doc_exists = True if d.get_doc_node() else False
+    :param decorator: parso decorator
+    """
+    names = []
+    leaf = decorator.children[0].get_next_leaf()
+    while leaf is not None and (leaf.type == 'name' or leaf.value == '.'):
+        names.append(leaf.value)
+        leaf = leaf.get_next_leaf()
+
+    return ''.join(names)
+
+
+def parse_funcdef(d, omissions):
+    is_doc_exists = True if d.get_doc_node() else False
+
+    (start_lineno, start_col) = d.start_pos
+    (end_lineno, end_col) = d.end_pos
+
+    is_async = d.parent.type in ('async_funcdef', 'async_stmt')
+    if is_async:
+        # Docstrings are indented relative to the async keyword.
+        start_col = d.parent.start_pos[1]
 
-        (start_lineno, start_col) = d.start_pos
-        (end_lineno, end_col) = d.end_pos
+    name = d.name.value
+    params = []
+    decorators = [get_decorator_name(decorator) for decorator in d.get_decorators()]
+    is_classmethod = 'classmethod' in decorators
+
+    for i, p in enumerate(d.get_params()):
+        if is_classmethod and i == 0:
+            # Ignore first argument if method is `@classmethod`.
+            continue
+
+        if p.name.value in omissions and i == 0:
+            # Method's first variable is maybe `self`.
+            continue
+
+        params.append(Param(
+            p.name.value,
+            annotation=p.annotation.get_code().strip() if p.annotation else None,
+            default=p.default.get_code().strip() if p.default else None,
+        ))
+
+    return_type = None
+    if d.children[3].value == '->':
+        return_type = d.children[4].get_code().strip()
+
+    return FunctionSignature(
+        name=name,
+        params=params,
+        return_type=return_type,
+        start_lineno=start_lineno,
+        start_col=start_col,
+        end_lineno=end_lineno,
+        end_col=end_col,
+        is_doc_exists=is_doc_exists,
+        is_async=is_async,
+        is_classmethod=is_classmethod,
+        is_staticmethod='staticmethod' in decorators,
+    )
+
+
+def parse_classdef(c):
+    is_doc_exists = True if c.get_doc_node() else False
+
+    (start_lineno, start_col) = c.start_pos
+    (end_lineno, end_col) = c.end_pos
+
+    return ClassSignature(
+        name=c.name.value,
+        start_lineno=start_lineno,
+        start_col=start_col,
+        end_lineno=end_lineno,
+        end_col=end_col,
+        is_doc_exists=is_doc_exists,
+    )
 
-        code = d.get_code()
-        start_col = get_start_col(code, start_col)
 
-        name = d.name.value
-        params = []
-        is_classmethod = any('@classmethod' in d.get_code() for d in d.get_decorators())
+def get_yield(y):
+    if y.parent.type == 'yield_expr':
+        return y.parent.children[1].get_first_leaf().value
 
-        for i, p in enumerate(d.get_params()):
-            if is_classmethod and i == 0:
-                # Ignore first argument if method is `@classmethod`.
+    # Bare yield
+    return ''
+
+
+def get_exception(e):
+    if e.type == 'raise_stmt':
+        return e.children[1].get_first_leaf().get_code().strip()
+
+    # Bare raise
+    return ''
+
+
+def visit(module, omissions=None, ignore_exception=False, ignore_yield=False, children=None):  # noqa C901
+    """Collect defs and classes of module in a single pass.
+
+    The tree is walked once with an explicit stack, so deeply nested code
+    neither hits the recursion limit nor is walked more than once.
+
+    Returns a tuple of signatures and a flat list of ``(signature, is_member)``
+    in source order, signatures being FunctionSignature or ClassSignature.
+    ``signatures`` holds module level classes and defs; methods are held by
+    their class' ``defs``, while defs and classes nested in a def belong to
+    the same list as that def, and classes nested in a class to the same
+    list as that class. ``is_member`` tells whether the
+    signature is held by ``defs`` of some class.
+
+    :param module: parso tree
+    :param omissions: Names of first argument of module level defs to omit
+    :param ignore_exception: Do not collect raise statements
+    :param ignore_yield: Do not collect yield expressions
+    :param children: Top level nodes to visit instead of every child of module
+    """
+    results = []
+    ordered = []
+    # A node is examined if every node between it and its enclosing def or
+    # class is one of these; the same rules as parso's iter_* helpers.
+    #   (node, def, defs, classes, omissions, find, raisable, yieldable)
+    stack = [
+        (child, None, results, results, omissions or [], True, False, False)
+        for child in reversed(module.children if children is None else children)
+    ]
+    while stack:
+        (node, func, defs, classes, omit, find, raisable, yieldable) = stack.pop()
+        type_ = node.type
+        if type_ == 'funcdef':
+            if not find:
                 continue
 
-            if p.name.value in omissions and i == 0:
-                # Method's first variable is maybe `self`.
+            func = parse_funcdef(node, omit)
+            defs.append(func)
+            ordered.append((func, defs is not results))
+            children = (func, defs, defs, [], True, not ignore_exception, not ignore_yield)
+        elif type_ == 'classdef':
+            if not find:
                 continue
 
-            arguments = {'argument': None, 'annotation': None, 'default': None}
-            arguments['argument'] = p.name.value
-            if p.annotation:
-                arguments['annotation'] = p.annotation.get_code().strip()
-            if p.default:
-                arguments['default'] = p.default.get_code().strip()
-
-            params.append(arguments)
-
-        return_type = None
-        if d.children[3].value == '->':
-            return_type = d.children[4].get_code().strip()
-
-        yields = []
-        if ignore_yield is False:
-            for y in d.iter_yield_exprs():
-                yields.append(y.children[1].get_first_leaf().value)
-
-        exceptions = []
-        if ignore_exception is False:
-            for e in d.iter_raise_stmts():
-                if hasattr(e, 'children'):
-                    exceptions.append(e.children[1].get_first_leaf().get_code().strip())
-                else:  # bare raise
-                    exceptions.append('')
-
-        results.append(
-            {
-                'name': name,
-                'params': params,
-                'return_type': return_type,
-                'start_lineno': start_lineno,
-                'start_col': start_col,
-                'end_lineno': end_lineno,
-                'end_col': end_col,
-                'is_doc_exists': is_doc_exists,
-                'exceptions': exceptions,
-                'yields': yields,
-            },
-        )
+            klass = parse_classdef(node)
+            classes.append(klass)
+            ordered.append((klass, classes is not results))
+            children = (None, klass.defs, classes, ['self'], True, False, False)
+        else:
+            if func is not None:
+                if raisable and (type_ == 'raise_stmt' or type_ == 'keyword' and node.value == 'raise'):
+                    func.add('exceptions', get_exception(node))
+                elif yieldable and type_ == 'keyword' and node.value == 'yield':
+                    func.add('yields', get_yield(node))
 
-        nested = parse_defs(
-            d,
-            ignore_exception=ignore_exception,
-            ignore_yield=ignore_yield,
-            ignore_init=ignore_init,
-        )
-        if len(nested):
-            results += nested
+            children = (
+                func,
+                defs,
+                classes,
+                omit,
+                find and type_ in FUNC_CONTAINERS,
+                raisable and type_ in RAISE_CONTAINERS,
+                yieldable and type_ != 'lambdef',
+            )
 
-        nested = parse_classdefs(d)
-        if len(nested):
-            results += nested
+        if hasattr(node, 'children'):
+            for child in reversed(node.children):
+                stack.append((child,) + children)
 
-    return results
+    return results, ordered
 
 
-def parse_classdefs(module, ignore_exception=False, ignore_yield=False, ignore_init=False):
-    results = []
+def get_grammar():
+    """Return the grammar of the running Python, loaded once per process."""
+    global _grammar
+    if _grammar is None:
+        # parso is slow to import and not needed when ast_parser succeeds.
+        import parso
 
-    for c in module.iter_classdefs():
-        is_doc_exists = True if c.get_doc_node() else False
+        _grammar = parso.load_grammar()
 
-        (start_lineno, start_col) = c.start_pos
-        (end_lineno, end_col) = c.end_pos
+    return _grammar
 
-        name = c.name.value
-        defs = parse_defs(
-            c,
-            omissions=['self'],
-            ignore_exception=ignore_exception,
-            ignore_yield=ignore_yield,
-            ignore_init=ignore_init,
-        )
-        results.append(
-            {
-                'name': name,
-                'defs': defs,
-                'start_lineno': start_lineno,
-                'start_col': start_col,
-                'end_lineno': end_lineno,
-                'end_col': end_col,
-                'is_doc_exists': is_doc_exists,
-            },
-        )
 
-        nested = parse_classdefs(c, ignore_exception=ignore_exception, ignore_yield=ignore_yield)
-        if len(nested):
-            results += nested
+def parse_module(m, omissions=None, ignore_exception=False, ignore_yield=False):
+    results, _ = visit(
+        m,
+        omissions=omissions,
+        ignore_exception=ignore_exception,
+        ignore_yield=ignore_yield,
+    )
 
-    results.sort(key=sort_by_lineno)
+    return [s.to_dict() for s in results]
 
-    return results
 
+def parse(code, omissions=None, ignore_exception=False, ignore_yield=False, ignore_init=False, parser='parso'):
+    if parser != 'parso':
+        from doq import ast_parser
 
-def parse(code, omissions=None, ignore_exception=False, ignore_yield=False, ignore_init=False):
-    m = parso.parse(code)
-    results = []
-    if 'class' in code:
-        results = parse_classdefs(
-            m,
-            ignore_exception=ignore_exception,
-            ignore_yield=ignore_yield,
-            ignore_init=ignore_init,
-        )
+        try:
+            return ast_parser.parse(
+                code,
+                omissions=omissions,
+                ignore_exception=ignore_exception,
+                ignore_yield=ignore_yield,
+                ignore_init=ignore_init,
+            )
+        except ast_parser.ERRORS:
+            if parser == 'ast':
+                raise
 
-    results += parse_defs(
+    m = get_grammar().parse(code)
+
+    return parse_module(
         m,
         omissions=omissions,
         ignore_exception=ignore_exception,
         ignore_yield=ignore_yield,
-        ignore_init=ignore_init,
     )
 
-    return results
+
+def parse_ordered(code, omissions=None, ignore_exception=False, ignore_yield=False, parser='parso'):
+    """Return ``(signature, is_member)`` of every def and class in source order.
+
+    See visit for the meaning of ``is_member``.
+
+    :param code: Source code
+    :param omissions: Names of first argument of module level defs to omit
+    :param ignore_exception: Do not collect raise statements
+    :param ignore_yield: Do not collect yield expressions
+    :param parser: One of PARSERS. auto tries doq.ast_parser first and falls
+                   back to parso if code does not compile. ast raises the
+                   error instead
+    """
+    if parser != 'parso':
+        from doq import ast_parser
+
+        try:
+            return ast_parser.parse_ordered(
+                code,
+                omissions=omissions,
+                ignore_exception=ignore_exception,
+                ignore_yield=ignore_yield,
+            )
+        except ast_parser.ERRORS:
+            if parser == 'ast':
+                raise
+
+    _, ordered = visit(
+        get_grammar().parse(code),
+        omissions=omissions,
+        ignore_exception=ignore_exception,
+        ignore_yield=ignore_yield,
+    )
+
+    return ordered
+
+
+class ParseSession:
+    """Parse successive versions of a single buffer.
+
+    The tree of the previous version is kept and handed to parso's diff
+    parser, so only the parts of the buffer which were edited are tokenized
+    and parsed again. parso reuses the nodes of unchanged parts, so
+    signatures are kept for each top level node and only extracted again
+    from nodes which are new or moved.
+    """
+
+    def __init__(self, omissions=None, ignore_exception=False, ignore_yield=False):
+        self.grammar = get_grammar()
+        # parso keeps diff parser state keyed by path.
+        self.path = '<doq-session-{0}>'.format(id(self))
+        self.options = {
+            'omissions': omissions,
+            'ignore_exception': ignore_exception,
+            'ignore_yield': ignore_yield,
+        }
+        # id of top level node: (node, its start_pos, its signatures)
+        self.nodes = {}
+        self.signatures = []
+
+    def parse(self, code):
+        """Parse buffer and return all signatures.
+
+        :param code: Current contents of buffer
+        """
+        self.update(code)
+
+        return self.signatures
+
+    def update(self, code):
+        """Parse buffer and return signatures which differ from last parse.
+
+        :param code: Current contents of buffer
+        """
+        m = self.grammar.parse(code, path=self.path, diff_cache=True)
+        previous = {(s['start_lineno'], s['name']): s for s in self.signatures}
+        nodes = {}
+        changed = []
+        for child in m.children:
+            # Nodes are held by the cache, so their ids are not reused.
+            cached = self.nodes.get(id(child))
+            if cached is None or cached[1] != child.start_pos:
+                results, _ = visit(m, children=[child], **self.options)
+                cached = (child, child.start_pos, [s.to_dict() for s in results])
+                changed.extend(
+                    s for s in cached[2]
+                    if previous.get((s['start_lineno'], s['name'])) != s
+                )
+            nodes[id(child)] = cached
+
+        self.nodes = nodes
+        self.signatures = [s for _, _, signatures in nodes.values() for s in signatures]
+
+        return changed
+
+    def close(self):
+        """Release the tree kept for buffer."""
+        from pathlib import Path
+
+        from parso.cache import parser_cache
+
+        for cache in parser_cache.values():
+            cache.pop(Path(self.path), None)
+
+        self.nodes = {}
+        self.signatures = []
+
+
+def get_span(signature):
+    """Return first and last lineno of def or class.
+
+    Blocks end at the start of the line after their last statement, in
+    which case that line is not part of them.
+
+    :param signature: FunctionSignature or ClassSignature
+    """
+    if signature.end_col == 0 and signature.end_lineno > signature.start_lineno:
+        return signature.start_lineno, signature.end_lineno - 1
+
+    return signature.start_lineno, signature.end_lineno
+
+
+class SignatureIndex:
+    """Defs and classes of a buffer indexed by the lines they span.
+
+    :param code: Source code
+    :param signatures: ``(signature, is_member)`` pairs as returned by parse_ordered
+    """
+
+    def __init__(self, code, signatures):
+        self.lines = Source(code)
+        self.signatures = signatures
+        self.tree = IntervalTree(
+            (*get_span(s), i)
+            for i, (s, _) in enumerate(signatures)
+        )
+
+    def spanning(self, line):
+        """Return ``(signature, is_member)`` of defs and classes spanning line, innermost first.
+
+        :param line: Lineno
+        """
+        # Spans containing a line are nested, so the later one in source
+        # order is the inner one.
+        return [self.signatures[i] for i in reversed(self.tree.at(line))]
+
+
+@functools.lru_cache(maxsize=32)
+def get_index(code, omissions=(), ignore_exception=False, ignore_yield=False, parser='auto'):
+    """Return SignatureIndex of code, kept for the buffers queried last.
+
+    Lookups hash code, which Python does once per string object, so
+    repeated queries with the same buffer cost a lookup in the index only.
+
+    :param code: Source code
+    :param omissions: Tuple of names of first argument to omit
+    :param ignore_exception: Do not collect raise statements
+    :param ignore_yield: Do not collect yield expressions
+    :param parser: One of PARSERS
+    """
+    signatures = parse_ordered(
+        code,
+        omissions=omissions,
+        ignore_exception=ignore_exception,
+        ignore_yield=ignore_yield,
+        parser=parser,
+    )
+
+    return SignatureIndex(code, signatures)
@@ -0,0 +1,73 @@
+"""Cheap check for whether a module needs docstrings at all.
+
+Most modules of a project have nothing to do: empty ``__init__.py`` files,
+modules of constants and modules whose defs and classes are all documented.
+They are told apart here without parsing, by looking at the few tokens
+around each ``def`` and ``class`` keyword.
+
+The check errs on the side of parsing. Anything it cannot read as a
+documented def or class, such as an f-string, concatenated strings or code
+which does not tokenize, makes the module be parsed.
+"""
+import bisect
+import re
+import tokenize
+
+from doq import ast_parser
+
+# Keyword of a def or class. Compound statements start a logical line, so
+# the keyword follows indentation and at most an async keyword.
+DEFINITION = re.compile(r'^[ \t\f]*(?:async[ \t\f]+)?(def|class)\b', re.MULTILINE)
+
+
+def is_documented(source, start):
+    """Tell whether def or class at position starts with a docstring.
+
+    Docstrings are plain string literals ending the first statement of the
+    body, as in ast_parser.is_doc_exists.
+
+    :param source: ast_parser.Source
+    :param start: Position of def or class keyword
+    """
+    tokens = source.iter_tokens(start)
+    next(tokens)
+    depth = 0
+    for type_, string, _, _ in tokens:
+        if string in ast_parser.OPENING:
+            depth += 1
+        elif string in ast_parser.CLOSING:
+            depth -= 1
+        elif string == ':' and depth == 0:
+            break
+
+    type_, string, _, _ = next(tokens)
+    if string == '\n':
+        type_, string, _, _ = next(tokens)
+    if type_ != tokenize.STRING or 'f' in ast_parser.STRING_START.match(string).group().lower():
+        return False
+
+    return next(tokens)[1] in ('', '\n', ';')
+
+
+def needs_docstrings(code):
+    """Tell whether code may have a def or class without docstring.
+
+    False only if every def and class certainly has one.
+
+    :param code: Source code
+    """
+    source = None
+    for matched in DEFINITION.finditer(code):
+        if source is None:
+            source = ast_parser.Source(code)
+
+        offsets = source.lines.offsets
+        lineno = bisect.bisect_right(offsets, matched.start(1))
+        col = matched.start(1) - offsets[lineno - 1]
+        try:
+            if not is_documented(source, (lineno, col)):
+                return True
+        except (StopIteration, *ast_parser.ERRORS):
+            return True
+
+    return False
@@ -0,0 +1,176 @@
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socketserver
+import sys
+from io import StringIO
+
+from doq import __version__
+from doq.cli import (
+    generate_docstrings,
+    get_template_path,
+    parse_options,
+    run,
+)
+from doq.client import (
+    check_socket,
+    check_socket_dir,
+    get_socket_path,
+    recv_all,
+)
+from doq.parser import get_grammar
+from doq.template import clear_templates
+
+
+def get_stamp(path):
+    """Modification times of every file in template directory.
+
+    :param path: Path to template directory
+    """
+    try:
+        return tuple(sorted(
+            (entry.name, entry.stat().st_mtime_ns)
+            for entry in os.scandir(path)
+            if entry.is_file()
+        ))
+    except OSError:
+        return None
+
+
+class DoqHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(recv_all(self.request).decode('utf-8'))
+            response = self.server.process(request['argv'], request.get('stdin', ''), request['cwd'])
+        except Exception as e:
+            response = {'code': 1, 'stdout': '', 'stderr': '{0}\n'.format(e)}
+
+        self.request.sendall(json.dumps(response).encode('utf-8'))
+
+
+class DoqServer(socketserver.UnixStreamServer):
+    """Serve doq requests over a Unix socket.
+
+    Requests are handled one at a time since each of them changes the
+    working directory and captures ``sys.stdout`` for the duration of the
+    request. Parsed grammars, compiled templates and config files stay
+    loaded between requests; templates and configs are read again once their
+    modification time changes.
+    """
+
+    def __init__(self, path):
+        self.stamps = {}
+        super().__init__(path, DoqHandler)
+
+    def reload_templates(self, args):
+        path = get_template_path(
+            template_path=args.template_path,
+            formatter=args.formatter,
+        )
+        stamp = get_stamp(path)
+        if self.stamps.get(path) != stamp:
+            clear_templates(path)
+            self.stamps[path] = stamp
+
+    def execute(self, argv, stdin):
+        try:
+            args = parse_options(argv)
+            if args.file is sys.stdin:
+                args.file = StringIO(stdin)
+                args.file.name = '<stdin>'
+
+            self.reload_templates(args)
+            ret = run(args)
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+
+            sys.stderr.write('{0}\n'.format(e.code))
+            return 1
+
+        return 0 if ret else 1
+
+    def process(self, argv, stdin, cwd):
+        stdout = StringIO()
+        stderr = StringIO()
+        current_dir = os.getcwd()
+        try:
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                code = self.execute(argv, stdin)
+        finally:
+            os.chdir(current_dir)
+
+        return {
+            'code': code,
+            'stdout': stdout.getvalue(),
+            'stderr': stderr.getvalue(),
+        }
+
+
+def warm_up():
+    # parso is imported on demand, but requests should not wait for it.
+    get_grammar()
+    for formatter in ('sphinx', 'google', 'numpy'):
+        generate_docstrings(
+            ['def warm_up(arg: int) -> int:', '    pass'],
+            get_template_path(template_path=None, formatter=formatter),
+        )
+
+
+def serve(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    check_socket_dir(directory)
+    if os.path.lexists(path):
+        # Only a socket left behind by an earlier doqd is removed.
+        check_socket(path)
+        os.unlink(path)
+
+    server = DoqServer(path)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+
+def parse_server_options():
+    parser = argparse.ArgumentParser(
+        prog='doqd',
+        description='Docstring generator daemon.',
+        add_help=True,
+    )
+    parser.add_argument(
+        '--socket',
+        default=get_socket_path(),
+        help='Path to Unix socket',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version='%(prog)s {0}'.format(__version__),
+        help='Output the version number',
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_server_options()
+    warm_up()
+    try:
+        serve(args.socket)
+    except KeyboardInterrupt:
+        pass
+    except PermissionError as e:
+        sys.exit('doqd: {0}'.format(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import array
+import contextlib
+import itertools
+import re
+
+NEWLINE = re.compile('\n')
+
+
+class Source:
+    """Text of a file and the offsets its lines start at.
+
+    It reads like the list of lines without line endings doq used to pass
+    around, but the text is held once and lines are only sliced out of it
+    on access. Ranges of lines are taken with ``get_text``.
+
+    :param text: Text without the line ending of the last line
+    :param offsets: Offsets of the start of each line, computed if not given
+    """
+
+    __slots__ = ('text', 'offsets')
+
+    def __init__(self, text, offsets=None):
+        self.text = text
+        if offsets is None:
+            offsets = array.array('q', [0])
+            offsets.extend(m.end() for m in NEWLINE.finditer(text))
+        self.offsets = offsets
+
+    @classmethod
+    def read(cls, file, start=1, end=0):
+        """Read lines from start to end of file and close it.
+
+        Lines past end are never read.
+
+        :param file: File object opened in text mode
+        :param start: Start lineno
+        :param end: End lineno, or 0 for the last line
+        """
+        with contextlib.closing(file) as f:
+            if start <= 1 and end == 0:
+                text = f.read()
+            else:
+                text = ''.join(itertools.islice(f, max(start - 1, 0), end or None))
+
+        if not text:
+            return cls('', array.array('q'))
+        if text.endswith('\n'):
+            text = text[:-1]
+
+        return cls(text)
+
+    def __len__(self):
+        """Return number of lines."""
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        """Return line at index, or list of lines of slice."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('line index out of range')
+
+        return self.text[self.offsets[index]:self.get_end(index)]
+
+    def __iter__(self):
+        """Yield lines."""
+        for i in range(len(self)):
+            yield self[i]
+
+    def get_end(self, index):
+        """Return offset of the end of line at index, excluding its line ending.
+
+        :param index: Index of line
+        """
+        if index + 1 < len(self.offsets):
+            return self.offsets[index + 1] - 1
+
+        return len(self.text)
+
+    def get_text(self, start, end):
+        """Return lines from index start up to end joined by newlines.
+
+        :param start: Index of first line
+        :param end: Index after last line
+        """
+        end = min(end, len(self))
+        if start >= end:
+            return ''
+
+        return self.text[self.offsets[start]:self.get_end(end - 1)]
@@ -0,0 +1,207 @@
+import contextlib
+import json
+import os
+import sys
+import time
+
+PHASES = ('discover', 'read', 'scan', 'cache', 'parse', 'render', 'format', 'write')
+STATS_STYLES = ('text', 'json')
+
+
+class Timings:
+    """Wall and CPU seconds spent in each phase.
+
+    Instances are returned from pool workers, so they only hold plain data.
+    """
+
+    def __init__(self):
+        self.wall = dict.fromkeys(PHASES, 0.0)
+        self.cpu = dict.fromkeys(PHASES, 0.0)
+        self.docstrings = 0
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.wall[phase] += time.perf_counter() - wall
+            self.cpu[phase] += time.process_time() - cpu
+
+    def iterate(self, iterable, phase):
+        """Yield from iterable, timing each step as phase.
+
+        :param iterable: Lazy iterable such as a directory walk
+        :param phase: Name of phase
+        """
+        it = iter(iterable)
+        while True:
+            with self.timer(phase):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    def add(self, other):
+        for phase in PHASES:
+            self.wall[phase] += other.wall[phase]
+            self.cpu[phase] += other.cpu[phase]
+        self.docstrings += other.docstrings
+
+    def to_dict(self):
+        return {p: {'wall': self.wall[p], 'cpu': self.cpu[p]} for p in PHASES}
+
+
+def timer(timings, phase):
+    """Return a context manager timing phase, or doing nothing without timings.
+
+    :param timings: Timings or None
+    :param phase: Name of phase
+    """
+    if timings is None:
+        return contextlib.nullcontext()
+
+    return timings.timer(phase)
+
+
+def get_cpu_time():
+    # Includes pool workers once they have been joined.
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def get_peak_rss():
+    """Return peak resident set size in bytes of this process or any joined child.
+
+    None where the resource module is unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Kilobytes everywhere but on macOS.
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class RunStats:
+    """Counters and timings of a whole run.
+
+    :param per_file: Keep timings of each file
+    """
+
+    def __init__(self, per_file=False):
+        self.timings = Timings()
+        self.files = [] if per_file else None
+        self.scanned = 0
+        self.skipped = 0
+        self.changed = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss = None
+        self._start = (time.perf_counter(), get_cpu_time())
+
+    def add(self, path, timings, skipped=False):
+        self.scanned += 1
+        if skipped:
+            self.skipped += 1
+        self.timings.add(timings)
+        if self.files is not None:
+            self.files.append((path, timings))
+
+    def finish(self, changed):
+        """Stop the clocks.
+
+        :param changed: Number of files written, or which would be written without --write
+        """
+        self.changed = changed
+        self.wall = time.perf_counter() - self._start[0]
+        self.cpu = get_cpu_time() - self._start[1]
+        self.peak_rss = get_peak_rss()
+
+    @property
+    def throughput(self):
+        return self.scanned / self.wall if self.wall else 0.0
+
+    def to_dict(self):
+        result = {
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'phases': self.timings.to_dict(),
+            'files_scanned': self.scanned,
+            'files_skipped': self.skipped,
+            'files_changed': self.changed,
+            'docstrings': self.timings.docstrings,
+            'files_per_second': self.throughput,
+            'peak_rss': self.peak_rss,
+        }
+        if self.files is not None:
+            result['files'] = [
+                {'path': path, 'docstrings': t.docstrings, 'phases': t.to_dict()}
+                for path, t in self.files
+            ]
+
+        return result
+
+    def format(self):
+        lines = []
+        for path, t in self.files or ():
+            phases = ', '.join('{0} {1:.4f}s'.format(p, t.wall[p]) for p in PHASES if t.wall[p])
+            lines.append('{0}: wall {1:.4f}s, cpu {2:.4f}s ({3})'.format(
+                path,
+                sum(t.wall.values()),
+                sum(t.cpu.values()),
+                phases,
+            ))
+        if lines:
+            lines.append('')
+
+        lines.append('{0:<10} {1:>10} {2:>10}'.format('phase', 'wall', 'cpu'))
+        for phase in PHASES:
+            lines.append('{0:<10} {1:>9.4f}s {2:>9.4f}s'.format(
+                phase,
+                self.timings.wall[phase],
+                self.timings.cpu[phase],
+            ))
+        lines.append('{0:<10} {1:>9.4f}s {2:>9.4f}s'.format('total', self.wall, self.cpu))
+        lines.append('')
+        lines.append('files: {0} scanned, {1} skipped, {2} changed'.format(self.scanned, self.skipped, self.changed))
+        lines.append('docstrings: {0}'.format(self.timings.docstrings))
+        lines.append('throughput: {0:.1f} files/s'.format(self.throughput))
+        if self.peak_rss is not None:
+            lines.append('peak RSS: {0:.1f} MiB'.format(self.peak_rss / 1024 / 1024))
+
+        return '\n'.join(lines)
+
+    def write(self, stream, style='text'):
+        if style == 'json':
+            stream.write(json.dumps(self.to_dict(), indent=2) + '\n')
+        else:
+            stream.write(self.format() + '\n')
+
+
+@contextlib.contextmanager
+def profile(path):
+    """Dump cProfile statistics of the block to path, if path is given.
+
+    :param path: Output path readable with pstats, or None
+    """
+    if not path:
+        yield
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
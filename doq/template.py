@@ -1,18 +1,149 @@
+import functools
+import os
+import threading
+
 from jinja2 import (
     Environment,
+    FileSystemBytecodeCache,
     FileSystemLoader,
+    meta,
+    TemplateNotFound,
 )
 
+from doq.cache import get_cache_dir
+
+TEMPLATE_FILES = ('def.txt', 'class.txt', 'noarg.txt')
+
 
 class Template:
-    def __init__(self, paths):
+    def __init__(self, paths, bytecode_cache=None):
         self.env = Environment(
             loader=FileSystemLoader(paths),
             autoescape=False,
             auto_reload=False,
+            bytecode_cache=bytecode_cache,
         )
+        self.templates = {}
+        self.variables = {}
+
+    def compile(self, filenames=TEMPLATE_FILES):
+        """Compile templates and find variables they reference.
+
+        Missing templates are skipped here and reported once they are used.
+
+        :param filenames: Template file names
+        """
+        for filename in filenames:
+            try:
+                self.get_template(filename)
+                self.get_variables(filename)
+            except TemplateNotFound:
+                pass
+
+        return self
+
+    def get_template(self, filename):
+        if filename not in self.templates:
+            self.templates[filename] = self.env.get_template(filename)
+
+        return self.templates[filename]
+
+    def get_variables(self, filename):
+        """Return names of variables referenced by template.
+
+        :param filename: Template file name
+        """
+        if filename not in self.variables:
+            source, _, _ = self.env.loader.get_source(self.env, filename)
+            self.variables[filename] = meta.find_undeclared_variables(self.env.parse(source))
+
+        return self.variables[filename]
+
+    def uses(self, name, filename='def.txt'):
+        """Whether template references variable.
+
+        :param name: Variable name such as exceptions or yields
+        :param filename: Template file name
+        """
+        try:
+            return name in self.get_variables(filename)
+        except TemplateNotFound:
+            return False
 
     def load(self, params, filename=None):
         filename = filename or 'def.txt'
-        template = self.env.get_template(filename)
+        template = self.get_template(filename)
         return template.render(**params)
+
+
+class BytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache which treats errors of cache files as misses.
+
+    A read-only or full cache directory must never break a run.
+    """
+
+    def load_bytecode(self, bucket):
+        try:
+            super().load_bytecode(bucket)
+        except OSError:
+            bucket.reset()
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def get_bytecode_cache():
+    """Return on-disk cache of compiled templates.
+
+    jinja2 stores bytecode per template file name and checks it against a
+    checksum of the template source, so edited templates are compiled again.
+    Return None if the cache directory can not be created.
+    """
+    directory = os.path.join(get_cache_dir(), 'jinja')
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        return None
+
+    return BytecodeCache(directory)
+
+
+def get_template(path):
+    """Return compiled templates of directory.
+
+    Templates are compiled once per process and per template directory and
+    shared by every file processed afterwards, and by every thread.
+
+    :param path: Path to template directory
+    """
+    template = _templates.get(path)
+    if template is None:
+        with _templates_lock:
+            if path not in _templates:
+                _templates[path] = Template(
+                    paths=[path],
+                    bytecode_cache=get_bytecode_cache(),
+                ).compile()
+            template = _templates[path]
+
+    return template
+
+
+def clear_templates(path=None):
+    """Drop shared templates so that they are loaded again from disk.
+
+    :param path: Path to template directory. Drop all if it is not given
+    """
+    with _templates_lock:
+        if path is None:
+            _templates.clear()
+        else:
+            _templates.pop(path, None)
@@ -0,0 +1,135 @@
+import contextlib
+import os
+
+FSYNC_POLICIES = ('none', 'file', 'batch')
+
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def keep_owner(path, stat):
+    """Give path the owner and group of stat, telling whether it has them.
+
+    :param path: Path to file
+    :param stat: os.stat_result of file to take owner from
+    """
+    current = os.stat(path)
+    if (current.st_uid, current.st_gid) == (stat.st_uid, stat.st_gid):
+        return True
+
+    try:
+        os.chown(path, stat.st_uid, stat.st_gid)
+    except (OSError, AttributeError):
+        return False
+
+    return True
+
+
+class FileWriter:
+    """Replace files atomically and only when their contents change.
+
+    Contents are written to a temporary file next to the target which then
+    replaces the target with ``os.replace``, so an interrupted run never
+    leaves a half written source file behind. Files whose contents would
+    not change are not touched at all, keeping their mtime. Symlinks are
+    followed, and files with other hard links or an owner which can not be
+    kept are written in place instead.
+
+    :param fsync: ``none`` leaves flushing to the OS, ``file`` syncs each file
+                  before it replaces the target and ``batch`` syncs every
+                  replaced file and its directory once on ``close``
+    """
+
+    def __init__(self, fsync='none'):
+        self.fsync = fsync
+        self.changed = []
+        self.unchanged = 0
+
+    def write(self, path, content):
+        """Write contents to path if they differ.
+
+        Returns True if the file was replaced.
+
+        :param path: Path to file
+        :param content: New contents
+        """
+        if read_file(path) == content:
+            self.unchanged += 1
+            return False
+
+        # Replace the file links point to, not the links.
+        real = os.path.realpath(path)
+        stat = os.stat(real)
+        if stat.st_nlink > 1 or not self.replace(real, content, stat):
+            # Other hard links would keep the old contents, and only the
+            # owner of a file may give it away.
+            self.write_in_place(real, content)
+
+        self.changed.append(path)
+        return True
+
+    def replace(self, path, content, stat):
+        """Replace path with a new file of same mode and owner.
+
+        Returns False, leaving path alone, if the owner can not be kept.
+
+        :param path: Path to file, not a symlink
+        :param content: New contents
+        :param stat: os.stat_result of path
+        """
+        import shutil
+        import tempfile
+
+        directory = os.path.dirname(path)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.{0}.'.format(os.path.basename(path)), suffix='.doq')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                self.write_contents(f, content)
+
+            shutil.copymode(path, tmp)
+            if not keep_owner(tmp, stat):
+                os.unlink(tmp)
+                return False
+
+            os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+        return True
+
+    def write_in_place(self, path, content):
+        with open(path, 'w') as f:
+            self.write_contents(f, content)
+
+    def write_contents(self, f, content):
+        f.write(content)
+        if self.fsync == 'file':
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        if self.fsync != 'batch':
+            return
+
+        for path in self.changed:
+            fsync_path(path)
+
+        for directory in {os.path.dirname(os.path.realpath(path)) for path in self.changed}:
+            # Directories can not be opened on every platform.
+            with contextlib.suppress(OSError):
+                fsync_path(directory)
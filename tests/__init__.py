@@ -0,0 +1,8 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Keep compiled templates and results of test runs out of the user's cache.
+os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, os.environ['XDG_CACHE_HOME'], ignore_errors=True)
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from doq.api import (
+    _templates,
+    generate,
+    generate_many,
+)
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        self.code = '\n'.join([
+            'def foo(arg1: int) -> str:',
+            '    pass',
+            '',
+            '',
+            'class Bar:',
+            '    """Bar."""',
+            '',
+            '    def baz(self, arg1):',
+            '        raise ValueError()',
+        ])
+
+    def tearDown(self):
+        _templates.clear()
+
+    def test_generate(self):
+        actual = generate(self.code)
+        self.assertEqual(
+            {
+                'docstring': '    """foo.\n\n    :param arg1:\n    :type arg1: int\n    :rtype: str\n    """',
+                'line': 1,
+                'column': 4,
+                'start_lineno': 1,
+                'end_lineno': 3,
+            },
+            actual[0].to_dict(),
+        )
+        self.assertEqual([1, 8], [d.line for d in actual])
+
+        actual = generate(self.code, formatter='google', indent=2, omissions=['self'], ignore_exception=True)
+        self.assertEqual('      """baz.\n\n      Args:\n          arg1:\n      """', actual[1].docstring)
+        self.assertEqual(6, actual[1].column)
+
+    def test_does_not_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with patch.dict(os.environ, {'XDG_CACHE_HOME': tmpdir}), \
+                    patch('doq.template.get_bytecode_cache') as bytecode_cache:
+                generate(self.code)
+                bytecode_cache.assert_not_called()
+            self.assertEqual([], os.listdir(tmpdir))
+
+    def test_template_dir(self):
+        template_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+        actual = generate(self.code, template_dir=template_dir, omissions=['self'])
+        self.assertIn('ValueError', actual[1].docstring)
+
+    def test_generate_many(self):
+        actual = generate_many([self.code, 'FOO = 1', ''])
+        self.assertEqual([generate(self.code), [], []], actual)
+
+    def test_templates_are_compiled_once(self):
+        from doq.template import Template
+
+        with patch.object(Template, 'compile', autospec=True, side_effect=lambda self: self) as compile:
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(generate(self.code)))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(1, compile.call_count)
+        self.assertEqual([generate(self.code)] * 8, results)
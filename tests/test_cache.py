@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from doq.cache import (
+    get_cache_dir,
+    hash_templates,
+    MAX_AGE,
+    ResultCache,
+)
+from doq.source import Source
+
+
+class ResultCacheTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.basepath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        cls.template_path = os.path.join(cls.basepath, 'doq', 'templates', 'sphinx')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_cache_dir(self):
+        with patch.dict(os.environ, {'XDG_CACHE_HOME': self.directory}):
+            self.assertEqual(os.path.join(self.directory, 'doq'), get_cache_dir())
+
+    def test_set_and_get(self):
+        cache = ResultCache(self.directory, self.template_path, {})
+        key = cache.key(['def foo():', '    pass'])
+        self.assertIsNone(cache.get(key))
+
+        cache.set(key, [{'docstring': '"""foo."""'}])
+        self.assertEqual([{'docstring': '"""foo."""'}], cache.get(key))
+
+        # A new process only has the on-disk copy.
+        cache = ResultCache(self.directory, self.template_path, {})
+        self.assertEqual([{'docstring': '"""foo."""'}], cache.get(key))
+
+    def test_key_depends_on_options(self):
+        lines = ['def foo(self):', '    pass']
+        cache = ResultCache(self.directory, self.template_path, {'omissions': None})
+        other = ResultCache(self.directory, self.template_path, {'omissions': ['self']})
+        self.assertEqual(cache.key(lines), cache.key(list(lines)))
+        self.assertEqual(cache.key(lines), cache.key(Source('\n'.join(lines))))
+        self.assertNotEqual(cache.key(lines), other.key(lines))
+
+    def test_hash_templates(self):
+        template_path = os.path.join(self.directory, 'templates')
+        shutil.copytree(self.template_path, template_path)
+        expected = hash_templates(template_path)
+        self.assertEqual(expected, hash_templates(template_path))
+
+        with open(os.path.join(template_path, 'def.txt'), 'a') as f:
+            f.write('\n')
+        self.assertNotEqual(expected, hash_templates(template_path))
+
+    def test_prune(self):
+        cache = ResultCache(self.directory, self.template_path, {})
+        keys = [cache.key(['def {0}():'.format(name), '    pass']) for name in ('foo', 'bar', 'baz')]
+        for key in keys:
+            cache.set(key, [])
+        other = os.path.join(self.directory, 'ab', 'other.txt')
+        os.makedirs(os.path.dirname(other), exist_ok=True)
+        with open(other, 'w'):
+            pass
+        old = time.time() - 2 * MAX_AGE
+        for path in [cache.get_path(k) for k in keys] + [other]:
+            os.utime(path, (old, old))
+
+        ResultCache(self.directory, self.template_path, {}).get(keys[0])
+        cache.prune()
+        self.assertEqual(
+            [True, False, False, True],
+            [os.path.exists(p) for p in [cache.get_path(k) for k in keys] + [other]],
+        )
+
+        cache.set(keys[1], [])
+        os.utime(cache.get_path(keys[1]), (old, old))
+        cache.prune()
+        self.assertTrue(os.path.exists(cache.get_path(keys[1])))
+        cache.prune(interval=0)
+        self.assertFalse(os.path.exists(cache.get_path(keys[1])))
@@ -1,5 +1,8 @@
 import argparse
+import json
 import os
+import shutil
+import tempfile
 from io import StringIO
 from unittest import TestCase
 from unittest.mock import patch
@@ -7,15 +10,45 @@ from unittest.mock import patch
 from parameterized import parameterized
 
 from doq.cli import (
+    docstring_at,
     find_files,
     generate_docstrings,
+    get_display_path,
     get_lines,
+    get_shared_docstrings,
     get_targets,
     get_template_path,
+    iter_files,
+    iter_targets,
+    parse_ranges,
     run,
 )
 
 
+def make_args(**overrides):
+    args = argparse.Namespace(
+        file=None,
+        start=1,
+        end=0,
+        template_path=None,
+        formatter='sphinx',
+        style='string',
+        indent=4,
+        recursive=False,
+        write=False,
+        omit=None,
+        ignore_exception=False,
+        ignore_yield=False,
+        ignore_init=False,
+        config=None,
+    )
+    vars(args).update(overrides)
+    if isinstance(args.file, StringIO):
+        args.file.name = 'foo.py'
+
+    return args
+
+
 class CliTestCase(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -37,6 +70,13 @@ class CliTestCase(TestCase):
         cls.basepath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         cls.fixtures_path = os.path.join(cls.basepath, 'tests', 'fixtures')
 
+    def make_tree(self, directory, files):
+        for file in files:
+            shutil.copy(
+                os.path.join(self.fixtures_path, file),
+                os.path.join(directory, file.replace('.txt', '.py')),
+            )
+
     def test_output_with_sphinx_style(self):
         expected_path = os.path.join(self.basepath, 'tests', 'expected', 'sphinx')
         for file in self.files:
@@ -200,6 +240,52 @@ class CliTestCase(TestCase):
         for f in files:
             self.assertTrue(f.endswith('.py'))
 
+    def test_iter_files(self):
+        files = iter_files('.')
+        self.assertFalse(isinstance(files, list))
+        self.assertEqual(find_files('.'), list(files))
+
+    def test_iter_targets_with_exclude(self):
+        args = argparse.Namespace(
+            start=1,
+            end=0,
+            recursive=True,
+            directory=self.basepath,
+            exclude='tests,cli.py',
+            include='*.py',
+        )
+        paths = [t['path'] for t in iter_targets(args)]
+        self.assertIn(os.path.join(self.basepath, 'doq', 'parser.py'), paths)
+        self.assertNotIn(os.path.join(self.basepath, 'doq', 'cli.py'), paths)
+        self.assertEqual([], [p for p in paths if os.sep + 'tests' + os.sep in p])
+
+    def test_iter_targets_does_not_read_files(self):
+        args = argparse.Namespace(
+            start=1,
+            end=0,
+            recursive=True,
+            directory=os.path.join(self.basepath, 'doq'),
+        )
+        targets = list(iter_targets(args))
+        self.assertNotEqual(0, len(targets))
+        for target in targets:
+            self.assertEqual(['path'], list(target.keys()))
+
+    def test_documented_files_are_not_parsed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'foo.py')
+            with open(path, 'w') as f:
+                f.write('def foo():\n    """foo."""\n')
+
+            args = make_args(recursive=True, directory=tmpdir, jobs=1)
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                    patch('doq.cli.parse_ordered') as parse:
+                run(args)
+                args.check = True
+                self.assertTrue(run(args))
+                parse.assert_not_called()
+            self.assertEqual('', p.getvalue())
+
     def test_no_files(self):
         files = find_files('./fixtures')
         self.assertEqual(0, len(files))
@@ -642,3 +728,382 @@ class CliTestCase(TestCase):
         self.assertEqual(3, results[2]['end_col'])
         self.assertEqual(7, results[2]['start_lineno'])
         self.assertEqual(8, results[2]['end_lineno'])
+
+    def test_recursive_with_jobs(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.make_tree(tmpdir, self.files)
+
+            outputs = []
+            for jobs in (1, 2):
+                args = make_args(recursive=True, directory=tmpdir, jobs=jobs)
+                with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+                    run(args)
+                outputs.append(p.getvalue())
+
+            self.assertNotEqual('', outputs[0])
+            self.assertEqual(outputs[0], outputs[1])
+
+    def test_recursive_with_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            directory = os.path.join(tmpdir, 'src')
+            os.mkdir(directory)
+            self.make_tree(directory, self.files)
+
+            args = make_args(
+                recursive=True,
+                directory=directory,
+                jobs=1,
+                cache=True,
+                cache_dir=os.path.join(tmpdir, 'cache'),
+            )
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+                run(args)
+            expected = p.getvalue()
+
+            with patch('doq.cli.generate_docstrings') as g, \
+                    patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+                run(args)
+                g.assert_not_called()
+            self.assertEqual(expected, p.getvalue())
+
+    def test_shared_docstrings(self):
+        class Pool:
+            def __init__(self):
+                self.tasks = []
+
+            def apply_async(self, func, args):
+                self.tasks.append(args[0]['path'])
+                result = func(*args)
+                return type('Result', (), {'get': lambda _: result})()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for i, code in enumerate(['def foo(a):\n    pass\n'] * 3 + ['def bar(b):\n    pass\n']):
+                paths.append(os.path.join(tmpdir, '{0}.py'.format(i)))
+                with open(paths[-1], 'w') as f:
+                    f.write(code)
+
+            args = make_args(cache=True, cache_dir=os.path.join(tmpdir, 'cache'))
+            shared = get_shared_docstrings(args, get_template_path(None, 'sphinx'), None)
+            pool = Pool()
+            targets = [shared.submit(pool, {'path': path}) for path in paths]
+            targets = [shared.resolve(target) for target in targets]
+
+        self.assertEqual([paths[0], paths[3]], pool.tasks)
+        self.assertEqual(['foo'] * 3 + ['bar'], [t['docstrings'][0]['docstring'][3:6] for t in targets])
+
+    def test_ast_parser_skips_broken_files(self):
+        args = make_args(file=StringIO('def foo(a):\n    print "a"\n'), parser='ast')
+        args.file.name = '<stdin>'
+        with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                patch('doq.cli.sys.stderr', new_callable=StringIO) as e:
+            run(args)
+        self.assertEqual('', p.getvalue())
+        self.assertTrue(e.getvalue().startswith('<stdin>:2: skipped, '))
+
+        args.file = StringIO('def foo(a):\n    print "a"\n')
+        args.file.name = '<stdin>'
+        args.parser = 'auto'
+        with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+            run(args)
+        self.assertIn('"""foo.', p.getvalue())
+
+    def test_parse_ranges(self):
+        self.assertEqual([(10, 20), (140, 180)], parse_ranges('10-20,140-180'))
+        self.assertEqual([(15, 15)], parse_ranges('15'))
+        for value in ('a-b', '20-10', '0-1'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_ranges(value)
+
+    def test_ranges(self):
+        code = '''class Foo:
+    def foo(self, arg1):
+        pass
+
+    def bar(self, arg1):
+        pass
+
+
+def baz(arg1):
+    pass
+'''
+        args = make_args(
+            file=StringIO(code),
+            style='json',
+            omit='self',
+            ranges=[(5, 5), (9, 9)],
+        )
+        with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+            run(args)
+        actual = json.loads(p.getvalue())
+        self.assertEqual([1, 5, 9], [d['start_lineno'] for d in actual])
+
+    def test_ranges_of_adjacent_defs(self):
+        code = 'def a(x):\n    pass\ndef b(y):\n    pass\n'
+        with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+            run(make_args(file=StringIO(code), style='json', ranges=[(3, 4)]))
+        self.assertEqual([3], [d['start_lineno'] for d in json.loads(p.getvalue())])
+
+        with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                patch('doq.cli.sys.stderr', new_callable=StringIO):
+            self.assertFalse(run(make_args(file=StringIO(code), check=True, ranges=[(3, 4)])))
+        self.assertEqual(['foo.py:3:1: missing docstring in b'], p.getvalue().splitlines())
+
+        with patch('doq.cli.render_docstrings', return_value=[]) as r, \
+                patch('doq.cli.sys.stdout', new_callable=StringIO):
+            run(make_args(file=StringIO(code), ranges=[(3, 4)]))
+        self.assertEqual(['b'], [s.name for s, _ in r.call_args[0][1]])
+
+    def test_line(self):
+        code = '''class Foo:
+    """Foo."""
+
+    def foo(self, arg1):
+        pass
+
+
+def bar(arg1):
+    """bar."""
+'''
+        args = make_args(
+            file=StringIO(code),
+            style='json',
+            omit='self',
+            line=5,
+        )
+        with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+            run(args)
+        actual = json.loads(p.getvalue())
+        self.assertEqual([4], [d['start_lineno'] for d in actual])
+
+        for line in (1, 9):
+            args.file = StringIO(code)
+            args.file.name = 'foo.py'
+            args.line = line
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+                run(args)
+            self.assertEqual('', p.getvalue())
+
+    def test_docstring_at(self):
+        code = '\n'.join([
+            'def foo(arg1):',
+            '    def bar(',
+            '        arg2,',
+            '    ):',
+            '        pass',
+            '',
+            '    return bar',
+        ])
+        path = get_template_path(template_path=None, formatter='sphinx')
+        actual = docstring_at(code, 5, path)
+        self.assertEqual(
+            {
+                'docstring': '        """bar.\n\n        :param arg2:\n        """',
+                'line': 4,
+                'column': 8,
+                'start_lineno': 2,
+                'end_lineno': 6,
+            },
+            actual.to_dict(),
+        )
+        self.assertEqual('foo', docstring_at(code, 7, path).docstring.split('.')[0].strip('" '))
+        self.assertIsNone(docstring_at(code, 8, path))
+
+        code = '\n'.join([
+            'class Foo:',
+            '    def foo(self):',
+            '        """foo."""',
+            '',
+            '    def __init__(self):',
+            '        pass',
+        ])
+        self.assertEqual(1, docstring_at(code, 3, path).start_lineno)
+        self.assertEqual(5, docstring_at(code, 6, path).start_lineno)
+        self.assertEqual(1, docstring_at(code, 6, path, ignore_init=True).start_lineno)
+
+        code = 'def a(x):\n    pass\ndef b(y):\n    \"\"\"b.\"\"\"\n    def inner():\n        pass\n    return inner\n'
+        self.assertIsNone(docstring_at(code, 3, path))
+        self.assertIsNone(docstring_at(code, 7, path))
+        self.assertEqual(5, docstring_at(code, 6, path).start_lineno)
+
+        code = 'class Foo:\n    \"\"\"Foo.\"\"\"\n    def foo(self):\n        pass\nx = 1\n'
+        self.assertIsNone(docstring_at(code, 5, path))
+
+    def test_recursive_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.make_tree(tmpdir, self.files + self.ignore_files)
+            path = os.path.join(tmpdir, 'defs.py')
+            os.chmod(path, 0o755)
+
+            args = make_args(
+                recursive=True,
+                directory=tmpdir,
+                write=True,
+                jobs=1,
+                fsync='batch',
+            )
+            with patch('doq.cli.sys.stderr', new_callable=StringIO) as p:
+                run(args)
+            self.assertEqual('{0} files changed\n'.format(len(self.files)), p.getvalue())
+            self.assertEqual(0o755, os.stat(path).st_mode & 0o777)
+            self.assertEqual([], [f for f in os.listdir(tmpdir) if f.startswith('.')])
+
+            mtimes = {f: os.stat(os.path.join(tmpdir, f)).st_mtime_ns for f in os.listdir(tmpdir)}
+            with patch('doq.cli.sys.stderr', new_callable=StringIO) as p:
+                run(args)
+            self.assertEqual('0 files changed\n', p.getvalue())
+            self.assertEqual(
+                mtimes,
+                {f: os.stat(os.path.join(tmpdir, f)).st_mtime_ns for f in os.listdir(tmpdir)},
+            )
+
+    def test_recursive_with_stats(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.make_tree(tmpdir, self.files + self.ignore_files)
+
+            args = make_args(
+                recursive=True,
+                directory=tmpdir,
+                jobs=2,
+                profile=True,
+                stats_style='json',
+            )
+            with patch('doq.cli.sys.stdout', new_callable=StringIO), \
+                    patch('doq.cli.sys.stderr', new_callable=StringIO) as p:
+                run(args)
+            actual = json.loads(p.getvalue())
+            self.assertEqual(len(self.files + self.ignore_files), actual['files_scanned'])
+            self.assertEqual(len(self.ignore_files), actual['files_skipped'])
+            self.assertEqual(len(self.files), actual['files_changed'])
+            self.assertEqual(actual['docstrings'], sum(f['docstrings'] for f in actual['files']))
+            self.assertGreater(actual['phases']['parse']['wall'], 0)
+
+    def test_recursive_with_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.make_tree(tmpdir, self.files)
+
+            args = make_args(
+                style='jsonl',
+                recursive=True,
+                directory=tmpdir,
+                jobs=1,
+            )
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+                run(args)
+            actual = [json.loads(line) for line in p.getvalue().splitlines()]
+            self.assertEqual(
+                sorted(os.path.join(tmpdir, f.replace('.txt', '.py')) for f in self.files),
+                sorted({d['path'] for d in actual}),
+            )
+            self.assertTrue(all(d['docstring'].lstrip().startswith('"""') for d in actual))
+
+    def test_check(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.make_tree(tmpdir, self.files + self.ignore_files)
+
+            args = make_args(
+                recursive=True,
+                directory=tmpdir,
+                write=True,
+                jobs=2,
+                check=True,
+            )
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                    patch('doq.cli.sys.stderr', new_callable=StringIO) as e, \
+                    patch('doq.cli.generate_docstrings') as g:
+                self.assertFalse(run(args))
+                g.assert_not_called()
+            self.assertEqual('{0} files missing docstrings\n'.format(len(self.files)), e.getvalue())
+            paths = {line.split(':')[0] for line in p.getvalue().splitlines()}
+            self.assertEqual(len(self.files), len(paths))
+            self.assertIn(':1:1: missing docstring in ', p.getvalue())
+
+            args.fail_fast = True
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                    patch('doq.cli.sys.stderr', new_callable=StringIO) as e:
+                self.assertFalse(run(args))
+            self.assertEqual('1 file missing docstrings\n', e.getvalue())
+            self.assertEqual(1, len({line.split(':')[0] for line in p.getvalue().splitlines()}))
+
+            args.fail_fast = False
+            args.check = False
+            run(args)
+            args.check = True
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                    patch('doq.cli.sys.stderr', new_callable=StringIO) as e:
+                self.assertTrue(run(args))
+            self.assertEqual('', p.getvalue())
+            self.assertEqual('0 files missing docstrings\n', e.getvalue())
+
+    def test_diff(self):
+        code = 'def foo(arg1):\n    pass\n\n\ndef bar():\n    """bar."""\n'
+        args = make_args(
+            file=StringIO(code),
+            style='json',
+            write=True,
+            diff=True,
+        )
+        with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                patch('doq.cli.FileWriter.write') as w:
+            self.assertTrue(run(args))
+            w.assert_not_called()
+
+        path = os.path.abspath('foo.py')
+        expected = '\n'.join([
+            '--- foo.py',
+            '+++ foo.py',
+            '@@ -1,4 +1,8 @@',
+            ' def foo(arg1):',
+            '+    """foo.',
+            '+',
+            '+    :param arg1:',
+            '+    """',
+            '     pass',
+            ' ',
+            ' ',
+        ])
+        self.assertTrue(p.getvalue().startswith(expected), p.getvalue())
+        self.assertEqual('foo.py', get_display_path(path))
+
+    def test_check_and_diff_bounds(self):
+        code = 'def foo():\n    pass\n\n\ndef bar(arg1):\n    pass\n\n\nclass A:\n    def baz(self):\n        pass\n'
+
+        for overrides, expected in [
+            ({'ranges': [(5, 5)]}, ['foo.py:5:1: missing docstring in bar']),
+            ({'line': 11}, ['foo.py:10:5: missing docstring in baz']),
+            ({'start': 5, 'end': 6}, ['foo.py:5:1: missing docstring in bar']),
+        ]:
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                    patch('doq.cli.sys.stderr', new_callable=StringIO):
+                self.assertFalse(run(make_args(file=StringIO(code), check=True, **overrides)))
+            self.assertEqual(expected, p.getvalue().splitlines(), overrides)
+
+        with patch('doq.cli.sys.stdout', new_callable=StringIO) as p:
+            self.assertTrue(run(make_args(file=StringIO(code), diff=True, start=5, end=6)))
+        self.assertIn('@@ -5,2 +5,6 @@', p.getvalue())
+
+    def test_coverage(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.make_tree(tmpdir, self.files + self.ignore_files)
+
+            args = make_args(
+                style='json',
+                recursive=True,
+                directory=tmpdir,
+                jobs=2,
+                coverage=True,
+                fail_under=100,
+            )
+            with patch('doq.cli.sys.stdout', new_callable=StringIO) as p, \
+                    patch('doq.cli.sys.stderr', new_callable=StringIO), \
+                    patch('doq.cli.generate_docstrings') as g:
+                self.assertFalse(run(args))
+                g.assert_not_called()
+            actual = json.loads(p.getvalue())
+            self.assertEqual(len(self.files + self.ignore_files), len(actual['modules']))
+            self.assertEqual(1, len(actual['packages']))
+            self.assertLess(actual['total']['coverage'], 100)
+
+            args.fail_under = actual['total']['coverage']
+            with patch('doq.cli.sys.stdout', new_callable=StringIO):
+                self.assertTrue(run(args))
@@ -0,0 +1,49 @@
+import json
+import os
+from unittest import TestCase
+
+from doq.coverage import Coverage
+
+
+class CoverageTestCase(TestCase):
+    def setUp(self):
+        self.basedir = os.path.abspath('src')
+        self.coverage = Coverage(
+            basedir=self.basedir,
+            display=lambda path: os.path.relpath(path),
+        )
+        self.coverage.add(os.path.join(self.basedir, 'foo.py'), 1, 2)
+        self.coverage.add(os.path.join(self.basedir, 'bar', 'bar.py'), 3, 3)
+        self.coverage.add(os.path.join(self.basedir, 'bar', 'baz', 'baz.py'), 0, 0)
+
+    def test_packages(self):
+        self.assertEqual(
+            {
+                self.basedir: (4, 5),
+                os.path.join(self.basedir, 'bar'): (3, 3),
+                os.path.join(self.basedir, 'bar', 'baz'): (0, 0),
+            },
+            self.coverage.get_packages(),
+        )
+        self.assertEqual(80.0, self.coverage.percent)
+
+    def test_json(self):
+        actual = json.loads(self.coverage.format('json'))
+        self.assertEqual(
+            {'documented': 1, 'missing': 1, 'total': 2, 'coverage': 50.0},
+            actual['modules'][os.path.join('src', 'foo.py')],
+        )
+        self.assertEqual(100.0, actual['packages'][os.path.join('src', 'bar', 'baz', '')]['coverage'])
+        self.assertEqual(5, actual['total']['total'])
+
+    def test_string(self):
+        lines = self.coverage.format().split('\n')
+        self.assertEqual(['Name', 'Total', 'Missing', 'Cover'], lines[0].split())
+        self.assertEqual(['TOTAL', '5', '1', '80.0%'], lines[-1].split())
+        self.assertIn([os.path.join('src', 'foo.py'), '2', '1', '50.0%'], [line.split() for line in lines])
+
+    def test_without_basedir(self):
+        coverage = Coverage()
+        coverage.add('<stdin>', 0, 1)
+        self.assertEqual({}, coverage.to_dict()['packages'])
+        self.assertEqual(0.0, coverage.percent)
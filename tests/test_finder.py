@@ -0,0 +1,120 @@
+import os
+import subprocess
+import tempfile
+from unittest import skipIf, TestCase
+
+from parameterized import parameterized
+
+from doq.finder import (
+    FileFinder,
+    translate_gitignore,
+)
+
+
+def has_git():
+    try:
+        subprocess.run(['git', '--version'], stdout=subprocess.DEVNULL, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+    return True
+
+
+class FileFinderTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.basedir = self.tmpdir.name
+        for path in (
+            'foo.py',
+            'foopy',
+            'README.rst',
+            '.hidden/foo.py',
+            'pkg/bar.py',
+            'pkg/baz_pb2.py',
+            'pkg/sub/qux.py',
+            'build/lib/foo.py',
+            'venv/lib/site.py',
+        ):
+            self.touch(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def touch(self, path, content=''):
+        path = os.path.join(self.basedir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def find(self, **kwargs):
+        return sorted(
+            os.path.relpath(p, self.basedir).replace(os.sep, '/')
+            for p in FileFinder(**kwargs).iter_files(self.basedir)
+        )
+
+    def test_find(self):
+        self.assertEqual([
+            'build/lib/foo.py',
+            'foo.py',
+            'pkg/bar.py',
+            'pkg/baz_pb2.py',
+            'pkg/sub/qux.py',
+            'venv/lib/site.py',
+        ], self.find())
+
+    def test_include_exclude(self):
+        self.assertEqual(
+            ['README.rst', 'foo.py', 'pkg/bar.py'],
+            self.find(include='*.py,*.rst', exclude='build,venv,pkg/sub,*_pb2.py'),
+        )
+
+    def test_gitignore(self):
+        self.touch('.gitignore', '# comment\nbuild/\nvenv\n*_pb2.py\n')
+        self.touch('pkg/.gitignore', '/sub\n!baz_pb2.py\n')
+        self.assertEqual(['foo.py', 'pkg/bar.py', 'pkg/baz_pb2.py'], self.find(gitignore=True))
+
+    def test_gitignore_of_parent(self):
+        os.mkdir(os.path.join(self.basedir, '.git'))
+        self.touch('.gitignore', 'sub/\n')
+        self.assertEqual(
+            ['bar.py', 'baz_pb2.py'],
+            sorted(os.path.basename(p) for p in FileFinder(gitignore=True).iter_files(
+                os.path.join(self.basedir, 'pkg'),
+            )),
+        )
+
+    @skipIf(not hasattr(os, 'symlink'), 'symlinks are not supported')
+    def test_symlink_loop(self):
+        os.symlink(os.path.join(self.basedir, 'pkg'), os.path.join(self.basedir, 'pkg', 'sub', 'loop'))
+        self.assertEqual(
+            ['pkg/bar.py', 'pkg/baz_pb2.py', 'pkg/sub/qux.py'],
+            self.find(exclude='build,venv,foo.py'),
+        )
+
+    @skipIf(not has_git(), 'git is not installed')
+    def test_git(self):
+        self.touch('.gitignore', 'build/\n')
+        subprocess.run(['git', 'init', '-q'], cwd=self.basedir, check=True)
+        self.assertEqual(
+            ['foo.py', 'pkg/bar.py', 'pkg/baz_pb2.py', 'pkg/sub/qux.py'],
+            self.find(git=True, exclude='venv'),
+        )
+
+    def test_git_outside_work_tree(self):
+        self.assertEqual(self.find(), self.find(git=True))
+
+    @parameterized.expand([
+        ('*.pyc', 'foo.pyc', True),
+        ('*.pyc', 'a/foo.pyc', True),
+        ('/build', 'build', True),
+        ('/build', 'a/build', False),
+        ('a/**/b', 'a/b', True),
+        ('a/**/b', 'a/x/y/b', True),
+        ('**/foo', 'x/foo', True),
+        ('foo/**', 'foo/x/y', True),
+        ('doc/*.py', 'doc/x/y.py', False),
+        ('[!a]b', 'cb', True),
+        ('[!a]b', 'ab', False),
+    ])
+    def test_translate_gitignore(self, pattern, path, expected):
+        self.assertEqual(expected, translate_gitignore(pattern).match(path) is not None)
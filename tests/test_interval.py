@@ -0,0 +1,37 @@
+import random
+from unittest import TestCase
+
+from doq.interval import IntervalTree
+
+
+class IntervalTreeTestCase(TestCase):
+    def test_empty(self):
+        tree = IntervalTree([])
+        self.assertEqual([], tree.overlap(1, 10))
+        self.assertEqual([], tree.at(1))
+
+    def test_overlap(self):
+        tree = IntervalTree([
+            (1, 10, 'Foo'),
+            (2, 4, 'foo'),
+            (6, 9, 'bar'),
+            (12, 20, 'baz'),
+        ])
+        self.assertEqual(['Foo', 'foo'], tree.overlap(3, 4))
+        self.assertEqual(['Foo', 'bar', 'baz'], tree.overlap(9, 12))
+        self.assertEqual([], tree.overlap(11, 11))
+        self.assertEqual(['Foo', 'foo'], tree.at(2))
+
+    def test_same_as_linear_scan(self):
+        rand = random.Random(0)
+        intervals = []
+        for i in range(200):
+            begin = rand.randint(1, 1000)
+            intervals.append((begin, begin + rand.randint(0, 100), i))
+
+        tree = IntervalTree(intervals)
+        for _ in range(200):
+            begin = rand.randint(1, 1100)
+            end = begin + rand.randint(0, 50)
+            expected = [v for b, e, v in intervals if b <= end and e >= begin]
+            self.assertEqual(expected, tree.overlap(begin, end))
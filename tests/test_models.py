@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+from doq.models import (
+    ClassSignature,
+    FunctionSignature,
+    Param,
+)
+from doq.parser import (
+    parse,
+    parse_ordered,
+)
+
+
+class ModelsTestCase(TestCase):
+    def setUp(self):
+        self.func = FunctionSignature(
+            name='foo',
+            params=[Param('arg1', annotation='int'), Param('arg2', default='None')],
+            return_type='str',
+            start_lineno=1,
+            start_col=0,
+            end_lineno=2,
+            end_col=0,
+            is_doc_exists=False,
+        )
+
+    def test_mapping_access(self):
+        self.assertEqual('foo', self.func['name'])
+        self.assertEqual('int', self.func['params'][0]['annotation'])
+        self.assertIn('yields', self.func)
+        self.assertNotIn('defs', self.func)
+        self.assertIsNone(self.func.get('defs'))
+        with self.assertRaises(KeyError):
+            self.func['defs']
+        self.assertEqual('str', dict(**self.func)['return_type'])
+
+    def test_to_dict(self):
+        self.func.add('exceptions', 'ValueError')
+        self.assertEqual(
+            {
+                'name': 'foo',
+                'params': [
+                    {'argument': 'arg1', 'annotation': 'int', 'default': None},
+                    {'argument': 'arg2', 'annotation': None, 'default': 'None'},
+                ],
+                'return_type': 'str',
+                'start_lineno': 1,
+                'start_col': 0,
+                'end_lineno': 2,
+                'end_col': 0,
+                'is_doc_exists': False,
+                'exceptions': ['ValueError'],
+                'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
+            },
+            self.func.to_dict(),
+        )
+
+        klass = ClassSignature('Foo', 1, 0, 3, 0, False)
+        klass.defs.append(self.func)
+        self.assertEqual(self.func.to_dict(), klass.to_dict()['defs'][0])
+
+    def test_interned(self):
+        code = '\n'.join([
+            'def foo(arg: Dict[str, int]):',
+            '    raise ValueError()',
+            '',
+            'def bar(arg: Dict[str, int]):',
+            '    raise ValueError()',
+        ])
+        for parser in ('ast', 'parso'):
+            (foo, _), (bar, _) = parse_ordered(code, parser=parser)
+            self.assertIs(foo.params[0].argument, bar.params[0].argument)
+            self.assertIs(foo.params[0].annotation, bar.params[0].annotation)
+            self.assertIs(foo.exceptions[0], bar.exceptions[0])
+
+    def test_parse_returns_dicts(self):
+        code = 'class Foo:\n    def foo(self, arg):\n        pass'
+        for parser in ('ast', 'parso'):
+            actual = parse(code, parser=parser)
+            self.assertIsInstance(actual[0], dict)
+            self.assertIsInstance(actual[0]['defs'][0]['params'][0], dict)
@@ -1,7 +1,9 @@
 import json
+from io import StringIO
 from unittest import TestCase
 
 from doq import (
+    JSONLinesOutputter,
     JSONOutputter,
     StringOutptter,
 )
@@ -212,6 +214,50 @@ class StringOutptterTestCase(TestCase):
         ])
         self.assertEqual(expected, output)
 
+    def test_many_docstrings(self):
+        lines = [
+            'class Foo:',
+            '    def foo(',
+            '        self,',
+            '        arg1,',
+            '    ):',
+            '        pass',
+            '',
+            '    def bar(self) -> Tuple[',
+            '        int,',
+            '    ]:',
+            '        pass',
+        ]
+        docstrings = [
+            {'docstring': '"""Foo."""', 'start_lineno': 1, 'start_col': 0, 'end_lineno': 11, 'end_col': 0},
+            {'docstring': '"""foo."""', 'start_lineno': 2, 'start_col': 4, 'end_lineno': 7, 'end_col': 4},
+            {'docstring': '"""bar."""', 'start_lineno': 8, 'start_col': 4, 'end_lineno': 11, 'end_col': 4},
+        ]
+        original = list(lines)
+        output = StringOutptter().format(lines=lines, docstrings=docstrings, indent=4)
+        expected = '\n'.join([
+            'class Foo:',
+            '    """Foo."""',
+            '    def foo(',
+            '        self,',
+            '        arg1,',
+            '    ):',
+            '        """foo."""',
+            '        pass',
+            '',
+            '    def bar(self) -> Tuple[',
+            '        int,',
+            '    ]:',
+            '        """bar."""',
+            '        pass',
+        ])
+        self.assertEqual(expected, output)
+        self.assertEqual(original, lines)
+
+        stream = StringIO()
+        StringOutptter().write(stream, lines=lines, docstrings=docstrings, indent=4)
+        self.assertEqual(expected, stream.getvalue())
+
 
 class JSONOutptterTestCase(TestCase):
     def test_same_lines(self):
@@ -247,3 +293,58 @@ class JSONOutptterTestCase(TestCase):
             'end_lineno': 2,
         }]
         self.assertEqual(json.dumps(expected), output)
+
+
+class JSONLinesOutputterTestCase(TestCase):
+    def test_multi_lines(self):
+        lines = [
+            'def foo(',
+            '    arg1,',
+            '):',
+            '    pass',
+            '',
+            'class Bar:',
+            '    def bar(self):',
+            '        pass',
+        ]
+        docstrings = [
+            {
+                'docstring': '"""foo.\n\n:param arg1:\n"""',
+                'start_lineno': 1,
+                'start_col': 0,
+                'end_lineno': 5,
+                'end_col': 0,
+            },
+            {
+                'docstring': '"""bar."""',
+                'start_lineno': 7,
+                'start_col': 4,
+                'end_lineno': 8,
+                'end_col': 4,
+            },
+        ]
+        output = JSONLinesOutputter(path='foo.py').format(
+            lines=lines,
+            docstrings=docstrings,
+            indent=4,
+        )
+
+        expected = [
+            {
+                'path': 'foo.py',
+                'line': 3,
+                'column': 4,
+                'docstring': '    """foo.\n\n    :param arg1:\n    """',
+                'start_lineno': 1,
+                'end_lineno': 5,
+            },
+            {
+                'path': 'foo.py',
+                'line': 7,
+                'column': 8,
+                'docstring': '        """bar."""',
+                'start_lineno': 7,
+                'end_lineno': 8,
+            },
+        ]
+        self.assertEqual(expected, [json.loads(line) for line in output.split('\n')])
@@ -1,11 +1,17 @@
 from unittest import TestCase
+from unittest.mock import patch
 
 from parameterized import parameterized
 
+from doq import ast_parser
 from doq.parser import (
+    get_index,
     get_return_type,
     parse,
+    parse_ordered,
     parse_return_type,
+    ParseSession,
+    visit,
 )
 
 
@@ -26,6 +32,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -50,6 +59,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -74,6 +86,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -97,6 +112,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -120,6 +138,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -143,6 +164,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -166,6 +190,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -196,6 +223,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -226,6 +256,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -255,6 +288,9 @@ class ParseTestCase(TestCase):
                     'is_doc_exists': False,
                     'exceptions': [],
                     'yields': [],
+                    'is_async': False,
+                    'is_classmethod': False,
+                    'is_staticmethod': False,
                 },
             },
             {
@@ -281,6 +317,9 @@ class ParseTestCase(TestCase):
                     'is_doc_exists': False,
                     'exceptions': [],
                     'yields': [],
+                    'is_async': False,
+                    'is_classmethod': False,
+                    'is_staticmethod': False,
                 },
             },
         ]
@@ -313,6 +352,9 @@ class ParseTestCase(TestCase):
                     'is_doc_exists': False,
                     'exceptions': [],
                     'yields': [],
+                    'is_async': False,
+                    'is_classmethod': False,
+                    'is_staticmethod': False,
                 },
             },
             {
@@ -338,6 +380,9 @@ class ParseTestCase(TestCase):
                     'is_doc_exists': False,
                     'exceptions': [],
                     'yields': [],
+                    'is_async': False,
+                    'is_classmethod': False,
+                    'is_staticmethod': False,
                 },
             },
         ]
@@ -370,6 +415,9 @@ class ParseTestCase(TestCase):
                     'is_doc_exists': False,
                     'exceptions': [],
                     'yields': [],
+                    'is_async': False,
+                    'is_classmethod': False,
+                    'is_staticmethod': False,
                 },
             },
             {
@@ -395,6 +443,9 @@ class ParseTestCase(TestCase):
                     'is_doc_exists': False,
                     'exceptions': [],
                     'yields': [],
+                    'is_async': False,
+                    'is_classmethod': False,
+                    'is_staticmethod': False,
                 },
             },
         ]
@@ -427,6 +478,9 @@ class ParseTestCase(TestCase):
                     'is_doc_exists': False,
                     'exceptions': [],
                     'yields': [],
+                    'is_async': False,
+                    'is_classmethod': False,
+                    'is_staticmethod': False,
                 },
             },
             {
@@ -452,6 +506,9 @@ class ParseTestCase(TestCase):
                     'is_doc_exists': False,
                     'exceptions': [],
                     'yields': [],
+                    'is_async': False,
+                    'is_classmethod': False,
+                    'is_staticmethod': False,
                 },
             },
         ]
@@ -480,6 +537,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -511,6 +571,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -544,6 +607,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual[0],
         )
@@ -571,6 +637,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual[1],
         )
@@ -606,6 +675,9 @@ class ParseTestCase(TestCase):
                         'is_doc_exists': False,
                         'exceptions': [],
                         'yields': [],
+                        'is_async': False,
+                        'is_classmethod': False,
+                        'is_staticmethod': False,
                     },
                     {
                         'name': 'foo',
@@ -629,6 +701,9 @@ class ParseTestCase(TestCase):
                         'is_doc_exists': False,
                         'exceptions': [],
                         'yields': [],
+                        'is_async': False,
+                        'is_classmethod': False,
+                        'is_staticmethod': False,
                     },
                 ],
                 'start_lineno': 1,
@@ -678,6 +753,9 @@ class ParseTestCase(TestCase):
                         'is_doc_exists': False,
                         'exceptions': [],
                         'yields': [],
+                        'is_async': False,
+                        'is_classmethod': False,
+                        'is_staticmethod': False,
                     },
                     {
                         'name': 'foo',
@@ -701,6 +779,9 @@ class ParseTestCase(TestCase):
                         'is_doc_exists': False,
                         'exceptions': [],
                         'yields': [],
+                        'is_async': False,
+                        'is_classmethod': False,
+                        'is_staticmethod': False,
                     },
 
 
@@ -740,6 +821,9 @@ class ParseTestCase(TestCase):
                         'is_doc_exists': False,
                         'exceptions': [],
                         'yields': [],
+                        'is_async': False,
+                        'is_classmethod': False,
+                        'is_staticmethod': False,
                     },
                     {
                         'name': 'bar',
@@ -758,6 +842,9 @@ class ParseTestCase(TestCase):
                         'is_doc_exists': False,
                         'exceptions': [],
                         'yields': [],
+                        'is_async': False,
+                        'is_classmethod': False,
+                        'is_staticmethod': False,
                     },
                 ],
                 'start_lineno': 8,
@@ -796,6 +883,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': True,
                 'exceptions': [],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -822,6 +912,9 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [],
                 'yields': [],
+                'is_async': True,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
@@ -854,6 +947,9 @@ class ParseTestCase(TestCase):
                         'is_doc_exists': False,
                         'exceptions': [],
                         'yields': [],
+                        'is_async': True,
+                        'is_classmethod': False,
+                        'is_staticmethod': False,
                     },
                 ],
                 'start_lineno': 1,
@@ -887,10 +983,102 @@ class ParseTestCase(TestCase):
                 'is_doc_exists': False,
                 'exceptions': [''],
                 'yields': [],
+                'is_async': False,
+                'is_classmethod': False,
+                'is_staticmethod': False,
             },
             actual,
         )
 
+    def test_decorators(self):
+        line = '\n'.join([
+            'class Foo:',
+            '    # @classmethod',
+            '    @functools.wraps(bar)',
+            '    def foo(self, arg1):',
+            '        pass',
+            '',
+            '    @classmethod',
+            '    def bar(cls, arg1):',
+            '        pass',
+            '',
+            '    @staticmethod',
+            '    async  def baz(arg1):',
+            '        pass',
+        ])
+        actual = parse(line, omissions=['self'])[0]['defs']
+        self.assertEqual(
+            [
+                ('foo', ['arg1'], False, False, False, 4),
+                ('bar', ['arg1'], False, True, False, 4),
+                ('baz', ['arg1'], True, False, True, 4),
+            ],
+            [
+                (
+                    d['name'],
+                    [p['argument'] for p in d['params']],
+                    d['is_async'],
+                    d['is_classmethod'],
+                    d['is_staticmethod'],
+                    d['start_col'],
+                )
+                for d in actual
+            ],
+        )
+
+    def test_async_start_col(self):
+        line = '\n'.join([
+            'async def foo():',
+            '      default = 1',
+        ])
+        self.assertEqual(0, parse(line)[0]['start_col'])
+
+
+class AstParseTestCase(ParseTestCase):
+    """Run ParseTestCase with the ast backend, comparing it with parso."""
+
+    def setUp(self):
+        parse_with_parso = parse
+
+        def parse_with_ast(code, **kwargs):
+            expected = parse_with_parso(code, **kwargs)
+            try:
+                actual = ast_parser.parse(code, **kwargs)
+            except ast_parser.ERRORS:
+                # Such code is parsed with parso.
+                return expected
+            self.assertEqual(expected, actual)
+
+            return actual
+
+        patcher = patch('{0}.parse'.format(__name__), side_effect=parse_with_ast)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fallback_to_parso(self):
+        code = 'def foo(arg1):\n    """foo.'
+        with self.assertRaises(SyntaxError):
+            ast_parser.parse(code)
+        self.assertEqual(parse_ordered(code, parser='parso'), parse_ordered(code, parser='auto'))
+        with self.assertRaises(SyntaxError):
+            parse_ordered(code, parser='ast')
+
+    @parameterized.expand([
+        ('def foo(a: "x" = (1, 2), *args: int, b, **kwargs) -> Dict[\n    int,\n]:\n    pass',),
+        ('def foo(a, /, b, *, c=lambda x: x):\n    """foo."""\n    return 1',),
+        ('@decorator  # @classmethod\ndef foo(cls, a):\n    "a" "b"',),
+        ('class Foo:\n    async  def foo(self, a):\n        ("doc")\n        raise \\\n            Error',),
+        ('def foo():\n    x = (yield a) + (yield)\n    yield from b\n    yield f"{a}"\n    raise Error from e',),
+        ('def foo():\n    def bar():\n        yield 1\n    class Bar:\n        raise A\n    raise B;  # comment\n',),
+        ('def foo(ä: "ö" = "ü"):\n    raise Ä()',),
+    ])
+    def test_same_as_parso(self, code):
+        for kwargs in ({}, {'omissions': ['a']}, {'ignore_exception': True, 'ignore_yield': True}):
+            self.assertEqual(
+                parse_ordered(code, parser='parso', **kwargs),
+                ast_parser.parse_ordered(code, **kwargs),
+            )
+
 
 class ReturnTypeTestCase(TestCase):
     @parameterized.expand([
@@ -941,3 +1129,175 @@ class ReturnTypeTestCase(TestCase):
         lineno = len(given.split('\n')) + 1
         actual = parse_return_type(given, start_lineno=0, end_lineno=lineno)
         self.assertEqual(expected, actual)
+
+
+class ParseSessionTestCase(TestCase):
+    def setUp(self):
+        self.session = ParseSession()
+        self.code = '\n'.join([
+            'def foo(arg1):',
+            '    pass',
+            '',
+            '',
+            'class Foo:',
+            '    def bar(self, arg1):',
+            '        pass',
+            '',
+            '',
+            'def baz(arg1):',
+            '    pass',
+            '',
+        ])
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_parse(self):
+        self.assertEqual(parse(self.code), self.session.parse(self.code))
+
+    def test_update(self):
+        self.session.parse(self.code)
+        code = self.code.replace('def baz(arg1):', 'def baz(arg1, arg2):')
+
+        actual = self.session.update(code)
+        self.assertEqual(1, len(actual))
+        self.assertEqual('baz', actual[0]['name'])
+        self.assertEqual(['arg1', 'arg2'], [p['argument'] for p in actual[0]['params']])
+        self.assertEqual(parse(code), self.session.signatures)
+
+    def test_update_without_changes(self):
+        self.session.parse(self.code)
+        self.assertEqual([], self.session.update(self.code))
+
+    def test_update_visits_changed_nodes(self):
+        self.session.parse(self.code)
+        code = self.code.replace('def baz(arg1):', 'def baz(arg1, arg2):')
+        with patch('doq.parser.visit', wraps=visit) as v:
+            self.session.update(code)
+        # The end marker is new with every parse, and cheap to visit.
+        nodes = [c[1]['children'][0] for c in v.call_args_list]
+        self.assertEqual(['baz'], [n.name.value for n in nodes if n.type != 'endmarker'])
+
+    def test_update_inserted_lines(self):
+        self.session.parse(self.code)
+        code = self.code.replace('class Foo:', 'class Foo:\n    """Foo."""\n')
+
+        actual = self.session.update(code)
+        self.assertEqual(['Foo', 'baz'], [s['name'] for s in actual])
+        self.assertEqual(parse(code), self.session.signatures)
+
+
+class SignatureIndexTestCase(TestCase):
+    def setUp(self):
+        self.code = '\n'.join([
+            'class Foo:',
+            '    """Foo."""',
+            '',
+            '    def bar(self, arg1):',
+            '        def baz():',
+            '            pass',
+            '',
+            '        return baz',
+            '',
+            '',
+            'FOO = 1',
+        ])
+
+    @parameterized.expand([
+        (1, ['Foo']),
+        (4, ['bar', 'Foo']),
+        (5, ['baz', 'bar', 'Foo']),
+        (6, ['baz', 'bar', 'Foo']),
+        (8, ['bar', 'Foo']),
+        (11, []),
+    ])
+    def test_spanning(self, line, expected):
+        self.assertEqual(expected, [s.name for s, _ in get_index(self.code).spanning(line)])
+
+    @parameterized.expand([
+        (2, ['a']),
+        (3, ['b']),
+        (5, ['inner', 'b']),
+        (6, ['b']),
+        (9, ['method', 'Foo']),
+        (10, []),
+    ])
+    def test_spanning_adjacent(self, line, expected):
+        code = '\n'.join([
+            'def a(x):',
+            '    pass',
+            'def b(y):',
+            '    def inner():',
+            '        pass',
+            '    return inner',
+            'class Foo:',
+            '    def method(self):',
+            '        pass',
+            'x = 1',
+            '',
+        ])
+        self.assertEqual(expected, [s.name for s, _ in get_index(code).spanning(line)])
+
+    def test_cached(self):
+        self.assertIs(get_index(self.code), get_index(self.code))
+        self.assertIsNot(get_index(self.code), get_index(self.code, omissions=('self',)))
+        with patch('doq.parser.parse_ordered') as p:
+            get_index(self.code)
+            p.assert_not_called()
+
+
+class VisitTestCase(TestCase):
+    def test_source_order(self):
+        code = '\n'.join([
+            'def foo():',
+            '    pass',
+            '',
+            '',
+            'class Foo:',
+            '    def bar(self):',
+            '        class Bar:',
+            '            pass',
+            '',
+            '    class Baz:',
+            '        pass',
+            '',
+            '',
+            'def baz():',
+            '    def qux():',
+            '        pass',
+        ])
+        self.assertEqual(
+            [('foo', False), ('Foo', False), ('bar', True), ('Bar', True), ('Baz', False), ('baz', False),
+             ('qux', False)],
+            [(s['name'], is_member) for s, is_member in parse_ordered(code)],
+        )
+        self.assertEqual(['foo', 'Foo', 'Baz', 'baz', 'qux'], [s['name'] for s in parse(code)])
+        self.assertEqual(['bar', 'Bar'], [s['name'] for s in parse(code)[1]['defs']])
+
+    def test_ignore_flags_in_nested_classes(self):
+        code = '\n'.join([
+            'def foo():',
+            '    class Foo:',
+            '        def bar(self):',
+            '            raise ValueError()',
+            '            yield 1',
+        ])
+        actual = parse(code, ignore_exception=True, ignore_yield=True)
+        self.assertEqual([], actual[1]['defs'][0]['exceptions'])
+        self.assertEqual([], actual[1]['defs'][0]['yields'])
+
+    def test_bare_yield(self):
+        code = '\n'.join([
+            'def foo():',
+            '    x = yield',
+            '    yield x',
+        ])
+        self.assertEqual(['', 'x'], parse(code)[0]['yields'])
+
+    def test_deeply_nested(self):
+        depth = 90
+        code = ''.join('{0}def f{1}(a):\n'.format('    ' * i, i) for i in range(depth))
+        code += '    ' * depth + 'pass\n'
+        actual = parse(code)
+        self.assertEqual(depth, len(actual))
+        self.assertEqual(['f0', 'f1', 'f2'], [s['name'] for s in actual[:3]])
@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from doq.parser import parse_ordered
+from doq.prescan import needs_docstrings
+
+
+class PrescanTestCase(TestCase):
+    @parameterized.expand([
+        ('', False),
+        ('FOO = 1\ndefine = 2\nclass_ = 3\n', False),
+        ('def foo():\n    """foo."""\n', False),
+        ('def foo(): "foo."\n', False),
+        ('@bar\ndef foo():\n    b"foo."\n', False),
+        ('def foo(\n    a,\n    b=(1, 2),\n) -> dict[str, int]:\n    # Comment\n    "foo."; a\n', False),
+        ('class Foo:\n    """Foo."""\n\n    async def foo(self):\n        """foo."""\n', False),
+        ('def foo():\n    pass\n', True),
+        ('class Foo:\n    """Foo."""\n\n    async def foo(self):\n        pass\n', True),
+        ('def foo():\n    f"foo."\n', True),
+        ('def foo():\n    "foo" "bar"\n', True),
+        ('def foo():\n    ("foo.")\n', True),
+        ('def foo():\n    "foo".strip()\n', True),
+        ('def foo(:\n', True),
+        ('BAR = """\ndef foo():\n"""\n', True),
+    ])
+    def test_needs_docstrings(self, code, expected):
+        self.assertEqual(expected, needs_docstrings(code))
+        if not expected:
+            missing = [s for s, _ in parse_ordered(code) if not s.is_doc_exists]
+            self.assertEqual([], missing)
@@ -0,0 +1,130 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from doq.client import (
+    check_socket,
+    get_socket_path,
+    reads_stdin,
+    request,
+)
+from doq.server import (
+    DoqServer,
+    serve,
+)
+
+
+class DoqServerTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.basepath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        cls.fixtures_path = os.path.join(cls.basepath, 'tests', 'fixtures')
+        # Run requests outside of tests/fixtures, its setup.cfg sets style json.
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmpdir, 'doqd.sock')
+        cls.server = DoqServer(cls.path)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        shutil.rmtree(cls.tmpdir)
+
+    def test_stdin(self):
+        response = request(
+            ['--formatter', 'google'],
+            stdin='def foo(arg1):\n    pass\n',
+            cwd=self.tmpdir,
+            path=self.path,
+        )
+        expected = '\n'.join([
+            'def foo(arg1):',
+            '    """foo.',
+            '',
+            '    Args:',
+            '        arg1:',
+            '    """',
+            '    pass',
+            '',
+        ])
+        self.assertEqual(0, response['code'])
+        self.assertEqual(expected, response['stdout'])
+
+    def test_relative_file(self):
+        shutil.copy(os.path.join(self.fixtures_path, 'defs.txt'), self.tmpdir)
+        response = request(['-f', 'defs.txt'], cwd=self.tmpdir, path=self.path)
+        with open(os.path.join(self.basepath, 'tests', 'expected', 'sphinx', 'defs.txt')) as f:
+            expected = f.read()
+
+        self.assertEqual(0, response['code'])
+        self.assertEqual(expected, response['stdout'])
+
+    def test_invalid_arguments(self):
+        response = request(['--indent', 'foo'], cwd=self.fixtures_path, path=self.path)
+        self.assertEqual(2, response['code'])
+        self.assertIn('--indent', response['stderr'])
+
+    def test_reload_template(self):
+        template_path = os.path.join(self.tmpdir, 'templates')
+        shutil.copytree(os.path.join(self.basepath, 'examples'), template_path)
+        argv = ['-t', template_path]
+        stdin = 'def foo():\n    pass\n'
+
+        response = request(argv, stdin=stdin, cwd=self.tmpdir, path=self.path)
+        self.assertIn('"""foo.\n    """', response['stdout'])
+
+        filepath = os.path.join(template_path, 'noarg.txt')
+        with open(filepath, 'w') as f:
+            f.write('"""Changed {{ name }}."""')
+        stat = os.stat(filepath)
+        os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        response = request(argv, stdin=stdin, cwd=self.tmpdir, path=self.path)
+        self.assertIn('"""Changed foo."""', response['stdout'])
+
+
+class ClientTestCase(TestCase):
+    def test_reads_stdin(self):
+        self.assertTrue(reads_stdin([]))
+        self.assertTrue(reads_stdin(['--formatter', 'google']))
+        self.assertTrue(reads_stdin(['-f', '-']))
+        self.assertFalse(reads_stdin(['-f', 'foo.py']))
+        self.assertFalse(reads_stdin(['--file=foo.py']))
+        self.assertFalse(reads_stdin(['-ffoo.py']))
+        self.assertFalse(reads_stdin(['-r', '-d', 'src']))
+
+    def test_socket_path(self):
+        with patch.dict(os.environ, {'DOQD_SOCKET': '', 'XDG_RUNTIME_DIR': ''}):
+            self.assertEqual(
+                os.path.join(tempfile.gettempdir(), 'doqd-{0}'.format(os.getuid()), 'doqd.sock'),
+                get_socket_path(),
+            )
+
+    def test_check_socket(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'doqd.sock')
+            with self.assertRaises(FileNotFoundError):
+                check_socket(path)
+
+            with open(path, 'w'):
+                pass
+            with self.assertRaises(PermissionError):
+                request([], path=path)
+            with self.assertRaises(PermissionError):
+                serve(path)
+            self.assertTrue(os.path.isfile(path))
+            os.unlink(path)
+
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.bind(path)
+                check_socket(path)
+                os.chmod(tmpdir, 0o777)
+                with self.assertRaises(PermissionError):
+                    check_socket(path)
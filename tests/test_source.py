@@ -0,0 +1,57 @@
+import io
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from doq.source import Source
+
+
+class SourceTestCase(TestCase):
+    @parameterized.expand([
+        ('', []),
+        ('\n', ['']),
+        ('def foo():', ['def foo():']),
+        ('def foo():\n    pass\n', ['def foo():', '    pass']),
+        ('def foo():\n\n    pass\n\n', ['def foo():', '', '    pass', '']),
+    ])
+    def test_read(self, text, expected):
+        source = Source.read(io.StringIO(text))
+        self.assertEqual(expected, list(source))
+        self.assertEqual(len(expected), len(source))
+        self.assertEqual('\n'.join(expected), source.text)
+
+    @parameterized.expand([
+        (1, 0, ['a', 'b', 'c', 'd']),
+        (2, 0, ['b', 'c', 'd']),
+        (2, 3, ['b', 'c']),
+        (4, 4, ['d']),
+        (5, 0, []),
+    ])
+    def test_read_range(self, start, end, expected):
+        source = Source.read(io.StringIO('a\nb\nc\nd\n'), start, end)
+        self.assertEqual(expected, list(source))
+
+    def test_read_stops_at_end(self):
+        def iter_lines():
+            yield 'a\n'
+            yield 'b\n'
+            raise AssertionError('read past end')
+
+        source = Source.read(iter_lines(), 1, 2)
+        self.assertEqual(['a', 'b'], list(source))
+
+    def test_getitem(self):
+        source = Source('a\nbb\n\nccc')
+        self.assertEqual('bb', source[1])
+        self.assertEqual('', source[2])
+        self.assertEqual('ccc', source[-1])
+        self.assertEqual(['bb', ''], source[1:3])
+        self.assertEqual(['', 'ccc'], source[2:])
+        with self.assertRaises(IndexError):
+            source[4]
+
+    def test_get_text(self):
+        source = Source('a\nbb\n\nccc')
+        self.assertEqual('a\nbb', source.get_text(0, 2))
+        self.assertEqual('bb\n\nccc', source.get_text(1, 10))
+        self.assertEqual('', source.get_text(2, 2))
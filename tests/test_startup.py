@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+from doq import __version__
+
+# Modules which must not be imported until they are needed.
+LAZY_MODULES = ('parso', 'jinja2', 'multiprocessing', 'toml', 'shtab', 'doq.template')
+
+
+def run_python(args, stdin=''):
+    basepath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=basepath)
+    # Measure imports from bytecode, as an installed doq would.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    with tempfile.TemporaryDirectory() as cwd:
+        return subprocess.run(
+            [sys.executable, '-X', 'importtime'] + args,
+            input=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            cwd=cwd,
+            env=env,
+        )
+
+
+def get_import_times(stderr):
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+class StartupTestCase(TestCase):
+    def assert_not_imported(self, times):
+        imported = [m for m in times if m.split('.')[0] in LAZY_MODULES or m in LAZY_MODULES]
+        self.assertEqual([], imported)
+
+    def test_import(self):
+        times = get_import_times(run_python(['-c', 'import doq.cli']).stderr)
+        self.assertIn('doq.cli', times)
+        self.assert_not_imported(times)
+
+    def test_version(self):
+        result = run_python(['-m', 'doq.cli', '--version'])
+        self.assertEqual(0, result.returncode)
+        self.assertEqual('doq {0}\n'.format(__version__), result.stdout)
+        self.assert_not_imported(get_import_times(result.stderr))
+
+    def test_empty_stdin(self):
+        result = run_python(['-m', 'doq.cli'])
+        self.assertEqual(1, result.returncode)
+        self.assertEqual('', result.stdout)
+        self.assert_not_imported(get_import_times(result.stderr))
+
+    def test_lazy_attributes(self):
+        result = run_python([
+            '-c',
+            'import sys, doq; assert "jinja2" not in sys.modules; doq.Template; assert "jinja2" in sys.modules',
+        ])
+        self.assertEqual(0, result.returncode, result.stderr)
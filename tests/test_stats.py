@@ -0,0 +1,63 @@
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from doq.stats import (
+    PHASES,
+    profile,
+    RunStats,
+    timer,
+    Timings,
+)
+
+
+class StatsTestCase(TestCase):
+    def test_timer(self):
+        timings = Timings()
+        with timings.timer('parse'):
+            sum(range(10000))
+        self.assertGreater(timings.wall['parse'], 0)
+        self.assertEqual(0, timings.wall['render'])
+
+        with timer(None, 'parse'):
+            pass
+
+    def test_iterate(self):
+        timings = Timings()
+        self.assertEqual([0, 1, 2], list(timings.iterate(range(3), 'discover')))
+        self.assertGreater(timings.wall['discover'], 0)
+
+    def test_run_stats(self):
+        stats = RunStats(per_file=True)
+        for path, docstrings in (('foo.py', 2), ('bar.py', 0)):
+            timings = Timings()
+            timings.docstrings = docstrings
+            with timings.timer('parse'):
+                pass
+            stats.add(path, timings, skipped=docstrings == 0)
+        stats.finish(changed=1)
+
+        actual = json.loads(json.dumps(stats.to_dict()))
+        self.assertEqual(2, actual['files_scanned'])
+        self.assertEqual(1, actual['files_skipped'])
+        self.assertEqual(1, actual['files_changed'])
+        self.assertEqual(2, actual['docstrings'])
+        self.assertEqual(list(PHASES), list(actual['phases']))
+        self.assertEqual(['foo.py', 'bar.py'], [f['path'] for f in actual['files']])
+
+        stream = io.StringIO()
+        stats.write(stream)
+        self.assertIn('files: 2 scanned, 1 skipped, 1 changed', stream.getvalue())
+        self.assertIn('foo.py: wall', stream.getvalue())
+
+    def test_profile(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'doq.prof')
+            with profile(path):
+                sum(range(10))
+            self.assertTrue(os.path.exists(path))
+
+        with profile(None):
+            pass
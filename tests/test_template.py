@@ -1,7 +1,15 @@
 import os
+import shutil
+import tempfile
 from unittest import TestCase
+from unittest.mock import patch
 
 from doq import Template
+from doq.template import (
+    clear_templates,
+    get_bytecode_cache,
+    get_template,
+)
 
 
 class SphinxTestCase(TestCase):
@@ -264,3 +272,85 @@ class SphinxTestCase(TestCase):
         actual = self.template.load(params=params, filename='class.txt')
         expected = '"""foo."""\n'
         self.assertEqual(expected, actual)
+
+
+class TemplateRegistryTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.basepath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def tearDown(self):
+        clear_templates()
+
+    def test_shared(self):
+        path = os.path.join(self.basepath, 'doq', 'templates', 'sphinx')
+        template = get_template(path)
+        self.assertIs(template, get_template(path))
+        self.assertEqual({'def.txt', 'class.txt', 'noarg.txt'}, set(template.templates.keys()))
+
+        clear_templates(path)
+        self.assertIsNot(template, get_template(path))
+
+    def test_uses(self):
+        template = get_template(os.path.join(self.basepath, 'doq', 'templates', 'sphinx'))
+        self.assertTrue(template.uses('params'))
+        self.assertFalse(template.uses('exceptions'))
+        self.assertFalse(template.uses('yields'))
+
+        template = get_template(os.path.join(self.basepath, 'examples'))
+        self.assertTrue(template.uses('exceptions'))
+        self.assertTrue(template.uses('yields'))
+
+    def test_uses_ignores_plain_text(self):
+        with tempfile.TemporaryDirectory() as path:
+            with open(os.path.join(path, 'def.txt'), 'w') as f:
+                f.write('"""{{ name }} never yields or raises exceptions."""')
+
+            template = get_template(path)
+            self.assertFalse(template.uses('exceptions'))
+            self.assertFalse(template.uses('yields'))
+            self.assertEqual({'def.txt'}, set(template.templates.keys()))
+
+
+class BytecodeCacheTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_home = os.environ.get('XDG_CACHE_HOME')
+        os.environ['XDG_CACHE_HOME'] = os.path.join(self.directory, 'cache')
+        get_bytecode_cache.cache_clear()
+
+    def tearDown(self):
+        if self.cache_home is None:
+            del os.environ['XDG_CACHE_HOME']
+        else:
+            os.environ['XDG_CACHE_HOME'] = self.cache_home
+        get_bytecode_cache.cache_clear()
+        clear_templates()
+        shutil.rmtree(self.directory)
+
+    def test_cache_compiled_templates(self):
+        path = os.path.join(self.directory, 'templates')
+        os.mkdir(path)
+        filepath = os.path.join(path, 'noarg.txt')
+        with open(filepath, 'w') as f:
+            f.write('"""{{ name }}."""')
+
+        self.assertEqual('"""foo."""', get_template(path).load({'name': 'foo'}, 'noarg.txt'))
+        cache_path = os.path.join(self.directory, 'cache', 'doq', 'jinja')
+        self.assertEqual(1, len(os.listdir(cache_path)))
+
+        with open(filepath, 'w') as f:
+            f.write('"""Summary of {{ name }}."""')
+        clear_templates()
+
+        self.assertEqual('"""Summary of foo."""', get_template(path).load({'name': 'foo'}, 'noarg.txt'))
+
+    def test_unwritable_cache(self):
+        path = os.path.join(self.directory, 'templates')
+        os.mkdir(path)
+        with open(os.path.join(path, 'noarg.txt'), 'w') as f:
+            f.write('"""{{ name }}."""')
+
+        with patch('jinja2.bccache.tempfile.NamedTemporaryFile', side_effect=PermissionError), \
+                patch('jinja2.bccache.open', side_effect=PermissionError, create=True):
+            self.assertEqual('"""foo."""', get_template(path).load({'name': 'foo'}, 'noarg.txt'))
@@ -0,0 +1,74 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from doq.writer import FileWriter
+
+
+class FileWriterTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'foo.py')
+        with open(self.path, 'w') as f:
+            f.write('def foo():\n    pass\n')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    @parameterized.expand([
+        'none',
+        'file',
+        'batch',
+    ])
+    def test_write(self, fsync):
+        writer = FileWriter(fsync=fsync)
+        self.assertTrue(writer.write(self.path, 'def bar():\n    pass\n'))
+        writer.close()
+
+        with open(self.path) as f:
+            self.assertEqual('def bar():\n    pass\n', f.read())
+        self.assertEqual([self.path], writer.changed)
+        self.assertEqual(['foo.py'], os.listdir(self.tmpdir.name))
+
+    def test_skip_unchanged(self):
+        writer = FileWriter()
+        with patch('doq.writer.os.replace') as p:
+            self.assertFalse(writer.write(self.path, 'def foo():\n    pass\n'))
+            p.assert_not_called()
+        self.assertEqual([], writer.changed)
+        self.assertEqual(1, writer.unchanged)
+
+    def test_keep_file_on_error(self):
+        writer = FileWriter()
+        with patch('doq.writer.os.replace', side_effect=OSError):
+            with self.assertRaises(OSError):
+                writer.write(self.path, 'def bar():\n    pass\n')
+
+        with open(self.path) as f:
+            self.assertEqual('def foo():\n    pass\n', f.read())
+        self.assertEqual(['foo.py'], os.listdir(self.tmpdir.name))
+
+    def test_write_through_symlink(self):
+        link = os.path.join(self.tmpdir.name, 'link.py')
+        os.symlink(self.path, link)
+        writer = FileWriter(fsync='batch')
+        self.assertTrue(writer.write(link, 'def bar():\n    pass\n'))
+        writer.close()
+
+        self.assertTrue(os.path.islink(link))
+        with open(self.path) as f:
+            self.assertEqual('def bar():\n    pass\n', f.read())
+        self.assertEqual(['foo.py', 'link.py'], sorted(os.listdir(self.tmpdir.name)))
+
+    def test_write_hard_link_in_place(self):
+        link = os.path.join(self.tmpdir.name, 'link.py')
+        os.link(self.path, link)
+        writer = FileWriter()
+        self.assertTrue(writer.write(link, 'def bar():\n    pass\n'))
+
+        self.assertTrue(os.path.samefile(self.path, link))
+        with open(self.path) as f:
+            self.assertEqual('def bar():\n    pass\n', f.read())